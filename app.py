@@ -1,6 +1,8 @@
 import dash
 import dash_bootstrap_components as dbc
 from dash import html, dcc, Input, Output, State, callback
+from outbox import start_flusher as start_outbox_flusher
+from metrics import instrument_dash
 
 app = dash.Dash(
     __name__,
@@ -10,6 +12,29 @@ app = dash.Dash(
 )
 server = app.server
 
+# Kirim ulang baris submit yang masih pending di outbox lokal (lihat outbox.py)
+start_outbox_flusher()
+
+
+# Metrik scheduler kuota Sheets proses ini: kedalaman antrian & waktu tunggu (lihat sheets_scheduler.py)
+@server.route("/status/sheets")
+def sheets_status():
+    from flask import jsonify
+    from sheets_scheduler import get_scheduler
+    return jsonify(get_scheduler().metrics())
+
+
+# Metrik format Prometheus: latency/ukuran/error callback & Sheets, umur snapshot, outbox (lihat metrics.py)
+instrument_dash(app)
+
+
+@server.route("/metrics")
+def prometheus_metrics():
+    from flask import Response
+    from metrics import REGISTRY, CONTENT_TYPE
+    return Response(REGISTRY.render(), content_type=CONTENT_TYPE)
+
+
 # Static users (same credentials used in pages/login.py)
 USERS = {
     "admin": "admin123",
@@ -0,0 +1,307 @@
+// Filter periode dashboard di browser dari agregat ringkas (dcc.Store "period-data").
+// Rumus sama dengan utils.oee_metrics; struktur data lihat cube.client_aggregate.
+window.dash_clientside = Object.assign({}, window.dash_clientside, {
+    oee: (function () {
+        var MONTHS = ["January", "February", "March", "April", "May", "June", "July",
+            "August", "September", "October", "November", "December"];
+        var TYPED = {i1: Int8Array, u1: Uint8Array, i2: Int16Array, i4: Int32Array, f4: Float32Array, f8: Float64Array};
+
+        function monthLabel(b) {
+            // 'YYYY-MM' -> 'September 2025'
+            var m = /^(\d{4})-(\d{2})/.exec(String(b));
+            if (!m || +m[2] < 1 || +m[2] > 12) {
+                return String(b);
+            }
+            return MONTHS[+m[2] - 1] + " " + m[1];
+        }
+
+        // {"dtype", "bdata"} (base64, cube.typed_array) -> typed array; array biasa dikembalikan apa adanya
+        function typed(v) {
+            if (!v || Array.isArray(v) || !v.bdata) {
+                return v;
+            }
+            var raw = atob(v.bdata), bytes = new Uint8Array(raw.length);
+            for (var i = 0; i < raw.length; i++) {
+                bytes[i] = raw.charCodeAt(i);
+            }
+            return new TYPED[v.dtype](bytes.buffer);
+        }
+
+        function decodeColumns(obj) {
+            var out = {};
+            Object.keys(obj || {}).forEach(function (k) { out[k] = typed(obj[k]); });
+            return out;
+        }
+
+        // Largest-Triangle-Three-Buckets: index titik yang dipertahankan (selalu titik asli, jadi klik
+        // tetap jatuh ke hari yang sebenarnya)
+        function lttb(xs, ys, threshold) {
+            var n = xs.length;
+            if (threshold >= n || threshold < 3) {
+                return null;
+            }
+            var keep = [0], every = (n - 2) / (threshold - 2), a = 0;
+            for (var i = 0; i < threshold - 2; i++) {
+                var avgStart = Math.floor((i + 1) * every) + 1, avgEnd = Math.min(Math.floor((i + 2) * every) + 1, n);
+                var avgX = 0, avgY = 0;
+                for (var j = avgStart; j < avgEnd; j++) {
+                    avgX += xs[j]; avgY += ys[j];
+                }
+                avgX /= (avgEnd - avgStart); avgY /= (avgEnd - avgStart);
+                var start = Math.floor(i * every) + 1, end = Math.floor((i + 1) * every) + 1;
+                var maxArea = -1, next = start;
+                for (var k = start; k < end; k++) {
+                    var area = Math.abs((xs[a] - avgX) * (ys[k] - ys[a]) - (xs[a] - xs[k]) * (avgY - ys[a]));
+                    if (area > maxArea) {
+                        maxArea = area; next = k;
+                    }
+                }
+                keep.push(next);
+                a = next;
+            }
+            keep.push(n - 1);
+            return keep;
+        }
+
+        // Mode render tren: scatter spline biasa, atau WebGL + LTTB jika titik per line melebihi max_points
+        function renderTrend(trend, render) {
+            var maxPoints = render.max_points || 400, webgl = render.webgl || "auto";
+            var n = trend.x.length, keep = n > maxPoints ? lttb(trend.t, trend.y, maxPoints) : null;
+            var pick = function (arr) { return keep ? keep.map(function (i) { return arr[i]; }) : arr; };
+            var gl = webgl === "always" || (webgl === "auto" && n > maxPoints);
+            return {
+                type: gl ? "scattergl" : "scatter",
+                shape: gl ? "linear" : "spline",
+                x: pick(trend.x), y: pick(trend.y), customdata: pick(trend.customdata)
+            };
+        }
+
+        // Kernel metrik OEE (persen); NaN untuk pembagian dengan nol, sama seperti utils.oee_metrics
+        function oeeMetrics(good, defect, loading, maxOutput, downtime) {
+            var availability = loading > 0 ? (loading - downtime) / loading * 100 : NaN;
+            var performance = maxOutput !== 0 ? (good + defect) / maxOutput * 100 : NaN;
+            var quality = good !== 0 ? (good - defect) / good * 100 : NaN;
+            return [availability, performance, quality, availability * performance * quality / 10000];
+        }
+
+        function zeroNaN(v) {
+            return isNaN(v) ? 0 : v;
+        }
+
+        // Predikat periode per kode bulan YYYYMM, sama seperti cube.period_mask
+        function periodFilter(month, year) {
+            if (month && String(month) !== "ALL") {
+                var code = parseInt(String(month).replace("-", "").slice(0, 6), 10);
+                return function (b) { return b === code; };
+            }
+            if (year) {
+                var y = parseInt(year, 10);
+                return function (b) { return Math.floor(b / 100) === y; };
+            }
+            return function () { return true; };
+        }
+
+        function getColor(val) {
+            if (val < 65) {
+                return "#e74c3c";  // merah
+            } else if (val < 85) {
+                return "#f1c40f";  // kuning
+            }
+            return "#2ecc71";  // hijau
+        }
+
+        // Jumlahkan hari dalam periode per tanggal (harian) atau per bulan ('ALL'); hanya grup ber-baris OEE
+        function rollupLine(days, inPeriod, byMonth) {
+            var groups = [], index = {};
+            for (var i = 0; i < days.d.length; i++) {
+                var d = days.d[i], b = Math.floor(d / 100);
+                if (!inPeriod(b)) {
+                    continue;
+                }
+                var key = byMonth ? b : d;
+                var g = index[key];
+                if (g === undefined) {
+                    g = index[key] = {key: key, g: 0, x: 0, l: 0, m: 0, t: 0, r: 0};
+                    groups.push(g);
+                }
+                g.g += days.g[i]; g.x += days.x[i]; g.l += days.l[i];
+                g.m += days.m[i]; g.t += days.t[i]; g.r += days.r[i];
+            }
+            groups.sort(function (a, b) { return a.key - b.key; });
+            return groups.filter(function (g) { return g.r > 0; });
+        }
+
+        function paretoLine(rows, names, inPeriod) {
+            var sums = [], index = {};
+            if (rows) {
+                for (var i = 0; i < rows.b.length; i++) {
+                    if (!inPeriod(rows.b[i])) {
+                        continue;
+                    }
+                    var k = rows.k[i];
+                    if (index[k] === undefined) {
+                        index[k] = sums.length;
+                        sums.push({kategori: names[k], duration: 0});
+                    }
+                    sums[index[k]].duration += rows.v[i];
+                }
+            }
+            // urut durasi terbesar (stabil)
+            sums = sums.map(function (s, i) { return [s, i]; })
+                .sort(function (a, b) { return (b[0].duration - a[0].duration) || (a[1] - b[1]); })
+                .map(function (p) { return p[0]; });
+            var total = sums.reduce(function (acc, s) { return acc + s.duration; }, 0);
+            return {
+                kategori: sums.map(function (s) { return s.kategori; }),
+                duration: sums.map(function (s) { return s.duration; }),
+                text: sums.map(function (s) {
+                    var pct = total ? s.duration / total : 0;
+                    return (zeroNaN(pct) * 100).toFixed(1) + "%";
+                })
+            };
+        }
+
+        function lineView(days, pareto, names, inPeriod, byMonth) {
+            var groups = rollupLine(days, inPeriod, byMonth);
+            if (!groups.length) {
+                return null;
+            }
+            var tot = {g: 0, x: 0, l: 0, m: 0, t: 0};
+            var trend = {x: [], y: [], customdata: [], t: []};
+            groups.forEach(function (g) {
+                tot.g += g.g; tot.x += g.x; tot.l += g.l; tot.m += g.m; tot.t += g.t;
+                var mt = oeeMetrics(g.g, g.x, g.l, g.m, g.t).map(zeroNaN);
+                var key = String(g.key), y = +key.slice(0, 4), m = +key.slice(4, 6);
+                var day = key.slice(0, 4) + "-" + key.slice(4, 6) + "-" + (byMonth ? "01" : key.slice(6, 8));
+                trend.x.push(day);
+                trend.y.push(mt[3] / 100);  // agar hover % benar
+                // customdata[3]: tanggal asli titik ini, dipakai drill-down (handle_graph_click)
+                trend.customdata.push([mt[0] / 100, mt[1] / 100, mt[2] / 100, day]);
+                // posisi waktu numerik untuk downsampling (hari, atau bulan di mode 'ALL')
+                trend.t.push(byMonth ? y * 12 + m : Date.UTC(y, m - 1, +key.slice(6, 8)) / 864e5);
+            });
+            var kpi = oeeMetrics(tot.g, tot.x, tot.l, tot.m, tot.t).map(zeroNaN);
+            return {
+                kpis: {availability: kpi[0], performance: kpi[1], quality: kpi[2], oee: kpi[3]},
+                trend: trend,
+                pareto: paretoLine(pareto, names, inPeriod)
+            };
+        }
+
+        // Bulan/tahun terpilih -> predikat periode, mode bulanan ('ALL'), label judul & hovertemplate tren
+        function periodContext(month, year) {
+            var byMonth = Boolean(month) && String(month) === "ALL";
+            return {
+                byMonth: byMonth,
+                inPeriod: periodFilter(month, year),
+                label: (month && String(month) !== "ALL") ? monthLabel(month) : (year ? String(year) : "All Months"),
+                hover: (byMonth ? "<b>Bulan:</b> %{x|%B %Y}<br>" : "<b>Tanggal:</b> %{x|%d-%m-%Y}<br>") +
+                    "<b>OEE:</b> %{y:.1%}<br>" +
+                    "Availability: %{customdata[0]:.1%}<br>" +
+                    "Performance: %{customdata[1]:.1%}<br>" +
+                    "Quality: %{customdata[2]:.1%}<extra></extra>"
+            };
+        }
+
+        function viewOf(data, line, period) {
+            if (!data.lines[line]) {
+                return null;
+            }
+            return lineView(decodeColumns(data.lines[line]), decodeColumns(data.pareto[line]),
+                data.kategori, period.inPeriod, period.byMonth);
+        }
+
+        return {
+            // Opsi bulan untuk tahun terpilih (+ 'All Month'); pilihan bulan dipertahankan saat data di-refresh
+            bulan_options: function (year, data, current) {
+                var nu = window.dash_clientside.no_update;
+                if (!data) {
+                    return [nu, nu];
+                }
+                if (!data.months.length) {
+                    return [[], null];
+                }
+                var months = data.months.filter(function (b) {
+                    return !year || b.indexOf(String(year)) === 0;
+                }).sort();
+                var options = [{label: "All Month", value: "ALL"}].concat(months.map(function (b) {
+                    return {label: monthLabel(b), value: b};
+                }));
+                var triggered = (window.dash_clientside.callback_context.triggered || []).map(function (t) {
+                    return t.prop_id;
+                });
+                var keep = triggered.indexOf("tahun-dropdown.value") < 0 && current &&
+                    options.some(function (o) { return o.value === current; });
+                // default: bulan paling baru, else 'ALL'
+                var value = keep ? current : (options.length > 1 ? options[options.length - 1].value : "ALL");
+                return [options, value];
+            },
+
+            // KPI + visibilitas kartu untuk semua line (murah: teks saja); line di luar filter disembunyikan.
+            // Figure hanya diisi untuk line yang section-nya terbuka (update_line_figures)
+            update_lines: function (month, year, selected, lines, data) {
+                var ctx = window.dash_clientside.callback_context;
+                var outs = ctx.outputs_list;
+                if (!data) {
+                    return outs.map(function () { return window.dash_clientside.no_update; });
+                }
+                var period = periodContext(month, year);
+                var chosen = (selected && selected.length) ? selected.map(String) : null;
+                var views = {};
+                Object.keys(data.lines).forEach(function (line) {
+                    var view = viewOf(data, line, period);
+                    if (view) {
+                        views[line] = view;
+                    }
+                });
+
+                var cardStyles = outs[0].map(function (o) {
+                    var shown = views[o.id.line] && (!chosen || chosen.indexOf(o.id.line) >= 0);
+                    return shown ? {} : {display: "none"};
+                });
+                var kpiValues = outs[1].map(function (o) {
+                    var view = views[o.id.line];
+                    return view ? view.kpis[o.id.metric] : 0;
+                });
+                var kpiText = kpiValues.map(function (v) { return v.toFixed(1) + "%"; });
+                var kpiStyles = kpiValues.map(function (v) { return {color: getColor(v)}; });
+                return [cardStyles, kpiText, kpiStyles];
+            },
+
+            // Patch trace tren & pareto untuk satu line (MATCH); dipanggil saat grafiknya dipasang
+            // (section dibuka) dan saat periode / data berganti
+            update_line_figures: function (month, year, data) {
+                var nu = window.dash_clientside.no_update;
+                var outs = window.dash_clientside.callback_context.outputs_list;
+                if (!data) {
+                    return [nu, nu];
+                }
+                var line = outs[0].id.line, period = periodContext(month, year);
+                var view = viewOf(data, line, period);
+                var trend = renderTrend(view ? view.trend : {x: [], y: [], customdata: [], t: []}, data.render || {});
+                var pareto = view ? view.pareto : {kategori: [], duration: [], text: []};
+                var Patch = window.dash_clientside.Patch;
+                return [
+                    new Patch()
+                        .assign(["layout", "title", "text"], "📈 Tren OEE - Line " + line + " (" + period.label + ")")
+                        .assign(["layout", "xaxis", "tickformat"], period.byMonth ? "%b %Y" : "")
+                        .assign(["data", 0, "type"], trend.type)
+                        .assign(["data", 0, "line", "shape"], trend.shape)
+                        .assign(["data", 0, "hovertemplate"], period.hover)
+                        .assign(["data", 0, "x"], trend.x)
+                        .assign(["data", 0, "y"], trend.y)
+                        .assign(["data", 0, "customdata"], trend.customdata)
+                        .build(),
+                    new Patch()
+                        .assign(["data", 0, "x"], pareto.kategori)
+                        .assign(["data", 0, "y"], pareto.duration)
+                        .assign(["data", 0, "text"], pareto.text)
+                        // ensure bars are ordered by duration descending
+                        .assign(["layout", "xaxis", "categoryarray"], pareto.kategori)
+                        .assign(["layout", "annotations", 0, "visible"], !pareto.kategori.length)
+                        .build()
+                ];
+            }
+        };
+    })()
+});
@@ -0,0 +1,31 @@
+import os
+import logging
+
+logger = logging.getLogger(__name__)
+
+# Folder antrian job background (submit form input). Dibagi semua worker gunicorn:
+# worker web hanya mendaftarkan job lalu langsung bebas, job dijalankan di proses terpisah.
+# Set ke string kosong untuk menonaktifkan (submit kembali sinkron di dalam request)
+BACKGROUND_CACHE_DIR = os.environ.get("OEE_BACKGROUND_CACHE_DIR",
+                                      os.path.join(os.path.dirname(os.path.abspath(__file__)), ".background"))
+# Umur hasil job di cache sebelum dibuang (detik)
+BACKGROUND_RESULT_TTL = int(os.environ.get("OEE_BACKGROUND_RESULT_TTL", "3600"))
+
+_manager = None
+
+
+def get_background_manager():
+    """DiskcacheManager bersama untuk background callback, atau None jika dinonaktifkan / paket tidak ada."""
+    global _manager
+    if _manager is None and BACKGROUND_CACHE_DIR:
+        try:
+            import diskcache
+            from dash import DiskcacheManager
+            # DiskcacheManager juga butuh multiprocess & psutil
+            import multiprocess  # noqa: F401
+            import psutil  # noqa: F401
+        except ImportError:
+            logger.warning("diskcache/multiprocess/psutil tidak terpasang; submit input dijalankan sinkron")
+            return None
+        _manager = DiskcacheManager(diskcache.Cache(BACKGROUND_CACHE_DIR), expire=BACKGROUND_RESULT_TTL)
+    return _manager
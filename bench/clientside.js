@@ -0,0 +1,76 @@
+// Timing callback clientside dashboard (assets/dashboard.js) di node, dipanggil bench/pipeline.py.
+//
+//     node bench/clientside.js input.json
+//
+// input.json: {"periods": [[bulan, tahun], ...], "lines": [...], "metrics": [...], "data": period-data,
+//              "years": [...], "runs": n}. Output (stdout): JSON median ms per panggilan untuk tiap callback.
+const fs = require("fs");
+const path = require("path");
+const vm = require("vm");
+
+// Pengganti minimal dash_clientside.Patch (hanya yang dipakai dashboard.js)
+class Patch {
+    constructor() { this.operations = []; }
+    assign(location, value) { this.operations.push({operation: "Assign", location: location, params: {value: value}}); return this; }
+    build() { return {__dash_patch_update: "__dash_patch_update", operations: this.operations}; }
+}
+
+function loadAssets() {
+    const ctx = {atob: (s) => Buffer.from(s, "base64").toString("binary"), Date: Date, Math: Math};
+    ctx.window = ctx;
+    ctx.dash_clientside = {no_update: {}, Patch: Patch, callback_context: {}};
+    vm.createContext(ctx);
+    const source = fs.readFileSync(path.join(__dirname, "..", "assets", "dashboard.js"), "utf8");
+    vm.runInContext(source, ctx);
+    return ctx.window.dash_clientside;
+}
+
+function median(values) {
+    const sorted = values.slice().sort((a, b) => a - b);
+    const mid = Math.floor(sorted.length / 2);
+    return sorted.length % 2 ? sorted[mid] : (sorted[mid - 1] + sorted[mid]) / 2;
+}
+
+// median (antar run) dari rata-rata ms per panggilan
+function timeCalls(runs, calls) {
+    const samples = [];
+    for (let r = 0; r < runs; r++) {
+        const t0 = process.hrtime.bigint();
+        calls.forEach((call) => call());
+        samples.push(Number(process.hrtime.bigint() - t0) / 1e6 / calls.length);
+    }
+    return median(samples);
+}
+
+function main() {
+    const input = JSON.parse(fs.readFileSync(process.argv[2], "utf8"));
+    const dc = loadAssets();
+    const oee = dc.oee;
+    const runs = input.runs || 5;
+    const lines = input.lines;
+    const kpis = [].concat(...lines.map((l) => input.metrics.map((m) => ({id: {type: "kpi", line: l, metric: m}}))));
+    const cards = lines.map((l) => ({id: {type: "line-card", line: l}}));
+
+    const updateLines = input.periods.map(([month, year]) => () => {
+        dc.callback_context = {outputs_list: [cards, kpis, kpis]};
+        oee.update_lines(month, year, null, lines, input.data);
+    });
+    // satu panggilan = satu line yang grafiknya terpasang
+    const updateFigures = [].concat(...input.periods.map(([month, year]) => lines.map((line) => () => {
+        dc.callback_context = {outputs_list: [{id: {type: "oee-trend", line: line}}, {id: {type: "pareto", line: line}}]};
+        oee.update_line_figures(month, year, input.data);
+    })));
+    const bulanOptions = input.years.map((year) => () => {
+        dc.callback_context = {triggered: [{prop_id: "tahun-dropdown.value"}]};
+        oee.bulan_options(year, input.data, null);
+    });
+
+    const result = {
+        update_lines_ms: timeCalls(runs, updateLines),
+        update_line_figures_ms: timeCalls(runs, updateFigures),
+        bulan_options_ms: timeCalls(runs, bulanOptions),
+    };
+    process.stdout.write(JSON.stringify(result) + "\n");
+}
+
+main();
@@ -0,0 +1,107 @@
+"""Benchmark + cek exactly-once flush outbox terhadap Sheets palsu yang sering gagal.
+
+Setiap submit (1 baris OEE + beberapa downtime) dijurnal lalu langsung di-flush,
+sebagian submit diulang operator dengan isi sama. Setelah antrian dikuras, setiap
+baris unik harus ada tepat satu kali di worksheet; jika tidak, exit 1.
+
+    python bench/outbox.py
+    python bench/outbox.py --submits 2000 --fail-rate 0.3 --lost-rate 0.2 --latency 0.01
+"""
+import os
+import sys
+import time
+import random
+import logging
+import argparse
+import tempfile
+from collections import Counter
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+# Sheets palsu tetap lewat scheduler SheetsPool, tapi tanpa batas kuota dan state bucket/metrik di repo
+os.environ.setdefault("OEE_SHEETS_RATE", "1e9")
+os.environ.setdefault("OEE_SHEETS_BURST", "1e9")
+os.environ.setdefault("OEE_SHEETS_BUCKET_FILE", "")
+os.environ.setdefault("OEE_METRICS_DIR", "")
+
+
+def make_submit(rng, i):
+    tanggal = "2025-%02d-%02d" % (1 + i // 28 % 12, 1 + i % 28)
+    line, shift, sku = rng.choice(["1", "1b", "2"]), str(1 + i % 3), "SKU-%d" % i
+    rows = [("oee", [tanggal, line, shift, sku, 480, rng.randint(800, 1000), rng.randint(600, 800), rng.randint(0, 20), "bench"])]
+    for j in range(rng.randint(0, 3)):
+        rows.append(("downtime", [tanggal, sku, shift, line, "%02d:00" % (8 + j), "%02d:30" % (8 + j), 30,
+                                  "Breakdown", "WC-1", "Filling", "EQ-%d" % j, "bench"]))
+    return rows
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--submits", type=int, default=500)
+    parser.add_argument("--fail-rate", type=float, default=0.2, help="peluang append ditolak sebelum menulis")
+    parser.add_argument("--lost-rate", type=float, default=0.1, help="peluang append tertulis tapi respons hilang")
+    parser.add_argument("--resubmit", type=float, default=0.2, help="peluang operator mengirim ulang submit yang sama")
+    parser.add_argument("--latency", type=float, default=0.0, help="jeda per request Sheets (detik)")
+    parser.add_argument("--seed", type=int, default=1)
+    args = parser.parse_args(argv)
+
+    from datasource import FlakySheetSource, SHEET_HEADERS
+    from outbox import Outbox, OUTBOX_RETRY_MAX, row_key
+    # kegagalan disengaja; peringatan per flush hanya mengotori output
+    logging.getLogger("outbox").setLevel(logging.ERROR)
+
+    rng = random.Random(args.seed)
+    source = FlakySheetSource({name: {"header": header, "rows": []} for name, header in SHEET_HEADERS.items()},
+                              fail_rate=args.fail_rate, lost_response_rate=args.lost_rate,
+                              latency=args.latency, seed=args.seed)
+    with tempfile.TemporaryDirectory() as tmp:
+        outbox = Outbox(os.path.join(tmp, "outbox.db"))
+        expected = set()
+        # jam palsu: tiap putaran maju melewati backoff maksimum supaya semua baris jatuh tempo
+        clock = [time.time()]
+
+        def tick():
+            clock[0] += 2 * OUTBOX_RETRY_MAX + 1
+            return clock[0]
+
+        t0 = time.perf_counter()
+        submits = [make_submit(rng, i) for i in range(args.submits)]
+        resubmits = 0
+        for rows in submits:
+            expected.update(row_key(sheet, row) for sheet, row in rows)
+            outbox.enqueue(rows)
+            outbox.flush(source, now=tick())
+            if rng.random() < args.resubmit:
+                resubmits += 1
+                outbox.enqueue(rows)
+                outbox.flush(source, now=tick())
+        submit_seconds = time.perf_counter() - t0
+
+        rounds = 0
+        while outbox.pending_count() and rounds < 1000:
+            rounds += 1
+            outbox.flush(source, now=tick())
+        total_seconds = time.perf_counter() - t0
+        pending = outbox.pending_count()
+
+    written = Counter(row_key(name, row) for name, sheet in source.sheets.items() for row in sheet["rows"])
+    duplicates = sum(1 for key, n in written.items() if n > 1)
+    missing = len(expected - set(written))
+    extra = len(set(written) - expected)
+    rows_total = sum(len(rows) for rows in submits)
+    print("%d submit (%d baris, %d diulang operator): %.2fs submit+flush, %.2fs sampai antrian kosong (%d putaran drain)"
+          % (args.submits, rows_total, resubmits, submit_seconds, total_seconds, rounds))
+    print("throughput %.0f baris/s, %d append + %d read ke Sheets palsu, %d reconnect"
+          % (rows_total / total_seconds, source.append_calls, source.read_calls, source.pool.resets))
+    print("tertulis %d, duplikat %d, hilang %d, asing %d, masih pending %d"
+          % (sum(written.values()), duplicates, missing, extra, pending))
+    if duplicates or missing or extra or pending:
+        print("GAGAL: flush outbox tidak exactly-once")
+        return 1
+    print("OK")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,255 @@
+"""Benchmark pipeline OEE pada data sintetis 1x, 10x dan 100x volume saat ini (bench/synthetic.py).
+
+Per skala diukur: utils.calculate_oee, refresh snapshot penuh, update dashboard (kerangka +
+agregat period-data di server, dan callback clientside update_lines / update_line_figures di
+node jika tersedia), opsi bulan (layout() di server + bulan_options di browser) dan
+handle_graph_click (klik tren & pareto). Hasil disimpan sebagai JSON; dengan --baseline,
+waktu tercepat (min, lebih stabil dari median) dibandingkan dengan hasil sebelumnya dan
+exit 1 jika ada yang melambat melewati toleransi.
+
+    python bench/pipeline.py                                  # 1x dan 10x
+    python bench/pipeline.py --scales 1 10 100 --output bench/results/main.json
+    python bench/pipeline.py --baseline bench/results/main.json --tolerance 0.25
+"""
+import os
+import sys
+import json
+import time
+import shutil
+import platform
+import argparse
+import tempfile
+import statistics
+import subprocess
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+RESULTS_DIR = os.path.join(ROOT, "bench", "results")
+
+# proses bench terisolasi: tanpa snapshot bersama di disk, job background, atau outbox repo
+os.environ["OEE_SHARED_SNAPSHOT_DIR"] = ""
+os.environ["OEE_BACKGROUND_CACHE_DIR"] = ""
+os.environ.setdefault("OEE_DATA_SOURCE", "fake")
+os.environ.setdefault("OEE_OUTBOX_PATH", os.path.join(tempfile.gettempdir(), "oee-bench-outbox.db"))
+
+# selisih waktu di bawah ini (ms) dianggap noise saat membandingkan dengan baseline
+NOISE_FLOOR_MS = 5.0
+# jumlah klik grafik yang diukur per jenis
+CLICKS = 5
+
+
+def measure(fn, runs):
+    """Median/min waktu fn() dalam ms."""
+    times = []
+    for _ in range(runs):
+        t0 = time.perf_counter()
+        fn()
+        times.append((time.perf_counter() - t0) * 1000)
+    return {"median_ms": round(statistics.median(times), 3), "min_ms": round(min(times), 3), "runs": runs}
+
+
+def git_revision():
+    try:
+        out = subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=ROOT, capture_output=True, text=True, check=True)
+        return out.stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def click_targets(snap, month):
+    """(line, tanggal) titik tren dan (line, kategori) batang pareto pada bulan terakhir."""
+    import pandas as pd
+    df = snap.df[pd.to_datetime(snap.df["tanggal"]).dt.strftime("%Y-%m") == month]
+    days = df[["line", "tanggal"]].drop_duplicates()
+    days = days.sample(min(CLICKS, len(days)), random_state=0) if len(days) else days
+    trend = [(str(line), pd.Timestamp(tanggal).strftime("%Y-%m-%d")) for line, tanggal in days.itertuples(index=False)]
+    dt = snap.df_downtime[["line", "kategori"]].dropna().astype(str).drop_duplicates()
+    dt = dt.sample(min(CLICKS, len(dt)), random_state=0) if len(dt) else dt
+    pareto = list(dt.itertuples(index=False, name=None))
+    return trend, pareto
+
+
+def time_clicks(dm, targets, month, year, runs):
+    from dash._callback_context import context_value
+    from dash._utils import AttributeDict
+
+    trend, pareto = targets
+
+    def click(kind, line, data):
+        # callback_context seperti saat dipanggil renderer: value = clickData grafik yang diklik
+        prop_id = json.dumps({"line": line, "type": kind}, separators=(",", ":")) + ".clickData"
+        context_value.set(AttributeDict(triggered_inputs=[{"prop_id": prop_id, "value": data}]))
+        if kind == "oee-trend":
+            return dm.handle_graph_click([data], [], 0, False, month, year)
+        return dm.handle_graph_click([], [data], 0, False, month, year)
+
+    def trend_clicks():
+        for line, tanggal in trend:
+            click("oee-trend", line, {"points": [{"x": tanggal, "y": 0.5, "customdata": [0.9, 0.8, 0.9, tanggal]}]})
+
+    def pareto_clicks():
+        for line, kategori in pareto:
+            click("pareto", line, {"points": [{"x": kategori}]})
+
+    result = {}
+    for name, fn, count in (("trend", trend_clicks, len(trend)), ("pareto", pareto_clicks, len(pareto))):
+        if count:
+            timing = measure(fn, runs)
+            # per klik
+            result["handle_graph_click_" + name] = {k: (round(v / count, 3) if k.endswith("_ms") else v)
+                                                    for k, v in timing.items()}
+    return result
+
+
+def time_clientside(snap, lines, data, runs):
+    """Timing callback clientside di node; None jika node tidak ada."""
+    node = shutil.which("node")
+    if node is None or data is None:
+        return None
+    import plotly.io.json as pj
+    from pages.dashboard import KPI_METRICS
+    months = data["months"]
+    years = sorted({m[:4] for m in months})
+    periods = [(months[-1], years[-1]), ("ALL", years[-1]), (None, None)] if months else [(None, None)]
+    payload = {"periods": periods, "lines": lines, "metrics": [m for m, _ in KPI_METRICS],
+               "data": json.loads(pj.to_json_plotly(data)), "years": years, "runs": runs}
+    with tempfile.NamedTemporaryFile("w", suffix=".json", delete=False) as f:
+        json.dump(payload, f)
+    try:
+        out = subprocess.run([node, os.path.join(ROOT, "bench", "clientside.js"), f.name],
+                             capture_output=True, text=True, check=True)
+    finally:
+        os.unlink(f.name)
+    timings = json.loads(out.stdout.strip().splitlines()[-1])
+    return {name[:-3]: {"median_ms": round(ms, 3), "runs": runs} for name, ms in timings.items()}
+
+
+def time_calculate_oee(utils, source, runs):
+    # frame mentah hanya hidup selama fungsi ini (penting di skala 100x)
+    raw_oee, raw_downtime = source.read("oee"), source.read("downtime")
+    return measure(lambda: utils.calculate_oee(raw_oee.copy(), raw_downtime.copy()), runs)
+
+
+def bench_scale(factor, runs, clientside=True):
+    import plotly.io.json as pj
+    import datasource
+    import snapshot
+    import utils
+    import synthetic
+    dm = sys.modules["pages.dashboard"]
+
+    volume = synthetic.scaled_volume(factor)
+    df_oee, df_downtime = synthetic.make_frames(**volume)
+    source = synthetic.make_source(df_oee, df_downtime)
+    datasource.set_data_source(source)
+    result = {"volume": volume, "rows": {"oee": len(df_oee), "downtime": len(df_downtime)}}
+    del df_oee, df_downtime
+
+    result["calculate_oee"] = time_calculate_oee(utils, source, runs)
+
+    # refresh penuh (sekali): sumber baru -> builder baru, membaca + menghitung semua bulan
+    result["snapshot_refresh"] = measure(lambda: snapshot.refresh(source), 1)
+    snap = snapshot.refresh(source)
+
+    # update_dashboard: kerangka section + agregat period-data (server), per versi data
+    result["update_dashboard_server"] = measure(lambda: dm.build_line_sections(snap), runs)
+    sections, lines, data, options = dm.build_line_sections(snap)
+    result["period_data_bytes"] = len(pj.to_json_plotly(data))
+    result["skeleton_bytes"] = len(pj.to_json_plotly(sections))
+    dm.update_line_sections(snap.version)
+    result["update_dashboard_cached"] = measure(lambda: dm.update_line_sections(snap.version), runs)
+    # update_bulan_options: opsi awal dibangun di layout() (server), pergantian tahun di browser
+    result["update_bulan_options_layout"] = measure(dm.layout, runs)
+
+    months = data["months"] if data else []
+    month = months[-1] if months else None
+    year = month[:4] if month else None
+    result.update(time_clicks(dm, click_targets(snap, month), month, year, runs))
+
+    if clientside:
+        timings = time_clientside(snap, lines, data, runs)
+        if timings:
+            result["clientside"] = timings
+    return result
+
+
+def flatten(results):
+    """{(skala, nama): ms} dari struktur hasil (min_ms jika ada, selain itu median_ms)."""
+    flat = {}
+    for scale, entries in results.items():
+        for name, value in entries.items():
+            if isinstance(value, dict) and "median_ms" in value:
+                flat[(scale, name)] = value.get("min_ms", value["median_ms"])
+            elif name == "clientside" and isinstance(value, dict):
+                for sub, timing in value.items():
+                    flat[(scale, "clientside." + sub)] = timing["median_ms"]
+    return flat
+
+
+def compare(current, baseline, tolerance):
+    """Cetak perbandingan waktu; return daftar (skala, nama) yang melambat > tolerance."""
+    now, before = flatten(current["results"]), flatten(baseline["results"])
+    regressions = []
+    print("\nvs baseline %s (%s):" % (baseline["meta"].get("git"), baseline["meta"].get("created")))
+    for key in sorted(set(now) & set(before)):
+        ratio = now[key] / before[key] if before[key] else float("inf")
+        slower = ratio > 1 + tolerance and now[key] - before[key] > NOISE_FLOOR_MS
+        if slower:
+            regressions.append(key)
+        print("  %-4s %-34s %10.1f -> %10.1f ms  x%.2f%s"
+              % (key[0], key[1], before[key], now[key], ratio, "  MELAMBAT" if slower else ""))
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--scales", type=float, nargs="+", default=[1, 10], help="kelipatan volume saat ini")
+    parser.add_argument("-n", "--runs", type=int, default=5, help="run per pengukuran pada 1x (berkurang di skala besar)")
+    parser.add_argument("--output", help="file JSON hasil (default bench/results/pipeline-<waktu>.json)")
+    parser.add_argument("--baseline", help="file JSON hasil sebelumnya untuk dibandingkan")
+    parser.add_argument("--tolerance", type=float, default=0.25, help="batas melambat relatif terhadap baseline")
+    parser.add_argument("--no-clientside", action="store_true", help="lewati timing callback clientside di node")
+    args = parser.parse_args(argv)
+
+    import logging
+    logging.basicConfig(level=logging.WARNING)
+    import app  # noqa: F401 -- mendaftarkan halaman + callback seperti di server
+
+    results = {}
+    for factor in args.scales:
+        label = "%gx" % factor
+        runs = max(2, int(round(args.runs / factor ** 0.5)))
+        t0 = time.perf_counter()
+        results[label] = bench_scale(factor, runs, clientside=not args.no_clientside)
+        entry = results[label]
+        print("%s: %d baris oee, %d downtime (%.0fs)" % (label, entry["rows"]["oee"], entry["rows"]["downtime"],
+                                                        time.perf_counter() - t0))
+        for name, value in entry.items():
+            if isinstance(value, dict) and "median_ms" in value:
+                print("  %-34s %10.1f ms" % (name, value["median_ms"]))
+        for name, value in entry.get("clientside", {}).items():
+            print("  %-34s %10.1f ms" % ("clientside." + name, value["median_ms"]))
+
+    report = {"meta": {"git": git_revision(), "created": time.strftime("%Y-%m-%dT%H:%M:%S"),
+                       "python": platform.python_version(), "machine": platform.machine(),
+                       "cpus": os.cpu_count()},
+              "results": results}
+    output = args.output or os.path.join(RESULTS_DIR, "pipeline-%s.json" % time.strftime("%Y%m%d-%H%M%S"))
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    with open(output, "w") as f:
+        json.dump(report, f, indent=2)
+    print("hasil disimpan di", output)
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        regressions = compare(report, baseline, args.tolerance)
+        if regressions:
+            print("GAGAL: %d pengukuran melambat > %.0f%%" % (len(regressions), args.tolerance * 100))
+            return 1
+        print("OK")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,65 @@
+"""Benchmark cold start: import index.py dan akses app.server di interpreter baru.
+
+Gagal (exit 1) jika median waktu melewati budget, atau jika modul berat / pemuatan
+data sudah terjadi saat import (seharusnya baru saat request pertama).
+
+    python bench/startup.py                 # budget default OEE_STARTUP_BUDGET (detik)
+    python bench/startup.py --budget 2 -n 5
+"""
+import os
+import sys
+import json
+import argparse
+import statistics
+import subprocess
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+DEFAULT_BUDGET = float(os.environ.get("OEE_STARTUP_BUDGET", "2.0"))
+# modul yang tidak boleh ter-import saat startup
+HEAVY_MODULES = ("pandas", "plotly.express", "gspread", "pyarrow", "snapshot", "utils", "datasource")
+
+PROBE = """
+import sys, time, json
+t0 = time.perf_counter()
+import index
+index.app.server
+elapsed = time.perf_counter() - t0
+print(json.dumps({"seconds": elapsed, "heavy": [m for m in %r if m in sys.modules]}))
+""" % (HEAVY_MODULES,)
+
+
+def run_once():
+    env = dict(os.environ)
+    # sumber data palsu & tanpa snapshot disk: startup tidak boleh menyentuh jaringan/disk data
+    env.update({"OEE_DATA_SOURCE": "fake", "OEE_SHARED_SNAPSHOT_DIR": "", "PYTHONDONTWRITEBYTECODE": "1"})
+    out = subprocess.run([sys.executable, "-c", PROBE], cwd=ROOT, env=env,
+                         capture_output=True, text=True, check=True)
+    return json.loads(out.stdout.strip().splitlines()[-1])
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--budget", type=float, default=DEFAULT_BUDGET, help="batas median cold start (detik)")
+    parser.add_argument("-n", "--runs", type=int, default=3)
+    args = parser.parse_args(argv)
+
+    results = [run_once() for _ in range(args.runs)]
+    times = [r["seconds"] for r in results]
+    median = statistics.median(times)
+    heavy = sorted({m for r in results for m in r["heavy"]})
+    print("cold start import index + app.server: median %.2fs (min %.2fs, max %.2fs), budget %.2fs"
+          % (median, min(times), max(times), args.budget))
+    failed = False
+    if heavy:
+        print("GAGAL: modul berat ter-import saat startup: %s" % ", ".join(heavy))
+        failed = True
+    if median > args.budget:
+        print("GAGAL: cold start melewati budget")
+        failed = True
+    if not failed:
+        print("OK")
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
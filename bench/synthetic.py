@@ -0,0 +1,158 @@
+"""Generator data sintetis worksheet `oee` dan `downtime` untuk benchmark dan dev box.
+
+Bentuk kolom sama dengan sheet asli (header huruf kecil, tanggal YYYY-MM-DD, start/finish
+HH:MM). Shift 3 (22:00-06:00) menghasilkan downtime lintas tengah malam.
+
+    python bench/synthetic.py --scale 10 --out /tmp/oee.db       # tulis ke LocalSource (SQLite/Parquet)
+    python bench/synthetic.py --lines 5 --days 30 --events 4 --out /tmp/oee-parquet
+"""
+import os
+import sys
+import argparse
+
+import numpy as np
+import pandas as pd
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if ROOT not in sys.path:
+    sys.path.insert(0, ROOT)
+
+OEE_COLUMNS = ["tanggal", "line", "shift", "sku", "loading time", "output maksimal",
+               "good product output", "hold & all defect", "user"]
+DOWNTIME_COLUMNS = ["tanggal", "sku", "shift", "line", "start", "finish", "downtime",
+                    "kategori", "workcenter", "proses", "equipment", "user"]
+
+# Volume produksi saat ini (1x): 3 line, 3 shift, 2 SKU per shift, setahun histori,
+# rata-rata 2 kejadian downtime per shift/SKU
+BASE_VOLUME = {"lines": 3, "days": 365, "shifts": 3, "skus": 2, "events_per_shift": 2.0}
+
+SHIFT_MINUTES = 480
+SHIFT_START = [6 * 60, 14 * 60, 22 * 60]
+KATEGORI = ["Breakdown", "Setup/Changeover", "Material", "Quality", "Cleaning", "Operator", "Utility"]
+KATEGORI_WEIGHTS = [0.25, 0.2, 0.15, 0.1, 0.1, 0.12, 0.08]
+PROSES = ["Mixing", "Filling", "Capping", "Labeling", "Packing"]
+USERS = ["heri", "dayat", "latif", "bowo"]
+
+
+def scaled_volume(factor):
+    """Volume factor x BASE_VOLUME: sampai 10x lewat jumlah line (rollout pabrik), di atasnya lewat panjang histori."""
+    volume = dict(BASE_VOLUME)
+    volume["lines"] = BASE_VOLUME["lines"] * int(min(factor, 10))
+    volume["days"] = int(round(BASE_VOLUME["days"] * max(factor / 10.0, 1)))
+    return volume
+
+
+def line_names(count):
+    """Nama line: registry line_config dulu, sisanya diberi nomor lanjutan."""
+    from line_config import LINES
+    names = list(LINES[:count])
+    n = len(names)
+    while len(names) < count:
+        n += 1
+        if str(n) not in names:
+            names.append(str(n))
+    return names
+
+
+def make_frames(lines=BASE_VOLUME["lines"], days=BASE_VOLUME["days"], shifts=BASE_VOLUME["shifts"],
+                skus=BASE_VOLUME["skus"], events_per_shift=BASE_VOLUME["events_per_shift"],
+                start="2024-01-01", seed=0):
+    """Return (df_oee, df_downtime) seperti hasil baca sheet (satu baris OEE per tanggal x line x shift x SKU)."""
+    rng = np.random.default_rng(seed)
+    names = np.array(line_names(lines), dtype=object)
+    dates = pd.date_range(start, periods=days, freq="D").strftime("%Y-%m-%d").to_numpy(dtype=object)
+
+    # grid tanggal x line x shift x sku
+    d_idx, l_idx, s_idx, k_idx = [a.ravel() for a in np.meshgrid(
+        np.arange(days), np.arange(lines), np.arange(shifts), np.arange(skus), indexing="ij")]
+    n = d_idx.size
+    loading = np.full(n, SHIFT_MINUTES // skus)
+    # kecepatan ideal per line (unit/menit), sedikit berbeda per SKU
+    rate = rng.uniform(2.0, 6.0, lines)[l_idx] * rng.uniform(0.9, 1.1, (lines, skus))[l_idx, k_idx]
+    output_max = np.round(loading * rate).astype(int)
+
+    # kejadian downtime per baris OEE
+    events = rng.poisson(events_per_shift, n)
+    row = np.repeat(np.arange(n), events)
+    m = row.size
+    duration = np.clip(np.round(rng.lognormal(np.log(20), 0.8, m)), 1, 180).astype(int)
+    # jangan melebihi jatah menit SKU di shift itu
+    duration = np.minimum(duration, loading[row])
+    offset = (rng.random(m) * (SHIFT_MINUTES - duration)).astype(int)
+    begin = (np.array(SHIFT_START)[s_idx[row] % len(SHIFT_START)] + offset) % 1440
+    end = (begin + duration) % 1440
+    downtime_total = np.bincount(row, weights=duration, minlength=n)
+
+    run_time = np.maximum(loading - downtime_total, 0)
+    produced = np.round(run_time * rate * rng.uniform(0.8, 0.98, n)).astype(int)
+    defect = rng.binomial(produced, 0.02)
+
+    df_oee = pd.DataFrame({
+        "tanggal": dates[d_idx],
+        "line": names[l_idx],
+        "shift": (s_idx + 1).astype(str),
+        "sku": ["SKU-%s%d" % (chr(65 + k), l) for l, k in zip(l_idx, k_idx)],
+        "loading time": loading,
+        "output maksimal": output_max,
+        "good product output": produced,
+        "hold & all defect": defect,
+        "user": np.array(USERS, dtype=object)[rng.integers(0, len(USERS), n)],
+    }, columns=OEE_COLUMNS)
+
+    def hhmm(minutes):
+        return np.char.add(np.char.add(np.char.zfill((minutes // 60).astype(str), 2), ":"),
+                           np.char.zfill((minutes % 60).astype(str), 2))
+
+    df_downtime = pd.DataFrame({
+        "tanggal": df_oee["tanggal"].to_numpy()[row],
+        "sku": df_oee["sku"].to_numpy()[row],
+        "shift": df_oee["shift"].to_numpy()[row],
+        "line": df_oee["line"].to_numpy()[row],
+        "start": hhmm(begin).astype(object),
+        "finish": hhmm(end).astype(object),
+        "downtime": duration,
+        "kategori": np.array(KATEGORI, dtype=object)[rng.choice(len(KATEGORI), m, p=KATEGORI_WEIGHTS)],
+        "workcenter": np.char.add("WC-", names[l_idx[row]].astype(str)).astype(object),
+        "proses": np.array(PROSES, dtype=object)[rng.integers(0, len(PROSES), m)],
+        "equipment": np.char.add("EQ-", rng.integers(1, 9, m).astype(str)).astype(object),
+        "user": df_oee["user"].to_numpy()[row],
+    }, columns=DOWNTIME_COLUMNS)
+    return df_oee, df_downtime
+
+
+def make_source(df_oee, df_downtime):
+    """FakeSheetSource berisi kedua frame (meniru worksheet di memori)."""
+    from datasource import FakeSheetSource
+    return FakeSheetSource({"oee": df_oee, "downtime": df_downtime})
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--scale", type=float, help="kelipatan volume saat ini (menimpa --lines/--days)")
+    parser.add_argument("--lines", type=int, default=BASE_VOLUME["lines"])
+    parser.add_argument("--days", type=int, default=BASE_VOLUME["days"])
+    parser.add_argument("--shifts", type=int, default=BASE_VOLUME["shifts"])
+    parser.add_argument("--skus", type=int, default=BASE_VOLUME["skus"])
+    parser.add_argument("--events", type=float, default=BASE_VOLUME["events_per_shift"], help="rata-rata downtime per shift/SKU")
+    parser.add_argument("--start", default="2024-01-01")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--out", help="path LocalSource (.db/.sqlite = SQLite, selain itu folder Parquet)")
+    args = parser.parse_args(argv)
+
+    volume = {"lines": args.lines, "days": args.days, "shifts": args.shifts, "skus": args.skus,
+              "events_per_shift": args.events}
+    if args.scale:
+        volume.update({k: v for k, v in scaled_volume(args.scale).items() if k in ("lines", "days")})
+    df_oee, df_downtime = make_frames(start=args.start, seed=args.seed, **volume)
+    print("oee %d baris, downtime %d baris (%s)" % (len(df_oee), len(df_downtime), volume))
+    if args.out:
+        from datasource import LocalSource
+        target = LocalSource(args.out)
+        target.write("oee", df_oee)
+        target.write("downtime", df_downtime)
+        print("ditulis ke", args.out)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,173 @@
+import base64
+import numpy as np
+import pandas as pd
+
+# --- Cube OEE: komponen aditif per (line, tanggal, shift, sku) ---
+# Semua tampilan dashboard (harian, bulanan, tahunan; per line) cukup menjumlahkan
+# kolom-kolom ini lalu menghitung metrik dari totalnya.
+KEYS = ["line", "tanggal", "shift", "sku"]
+MEASURES = ["good product output", "hold & all defect", "loading time", "output maksimal", "duration", "rows"]
+
+
+def _period_codes(tanggal):
+    # kode bulan integer YYYYMM untuk filter cepat (tanpa perbandingan string)
+    return (tanggal.dt.year * 100 + tanggal.dt.month).fillna(0).astype("int32")
+
+
+def build_cube(df, df_downtime):
+    """Bangun cube dari frame OEE per baris (`df`) dan downtime ber-durasi.
+
+    `rows` = jumlah baris OEE di sel tsb; sel yang hanya berisi downtime punya rows 0.
+    """
+    if df.empty or "tanggal" not in df.columns or "line" not in df.columns:
+        return pd.DataFrame(columns=KEYS + MEASURES + ["bulan", "tahun"])
+    oee = df.copy()
+    for k in KEYS:
+        if k not in oee.columns:
+            oee[k] = ""
+    oee["rows"] = 1
+    agg_cols = ["good product output", "hold & all defect", "loading time", "output maksimal", "rows"]
+    for k in ("shift", "sku"):
+        oee[k] = oee[k].astype(str)
+    cube = oee.groupby(KEYS, observed=True)[agg_cols].sum()
+
+    if not df_downtime.empty and "duration" in df_downtime.columns and "tanggal" in df_downtime.columns:
+        dt = df_downtime[[c for c in KEYS if c in df_downtime.columns] + ["duration"]].copy()
+        for k in KEYS:
+            if k not in dt.columns:
+                dt[k] = ""
+        for k in ("line", "shift", "sku"):
+            dt[k] = dt[k].astype(str)
+        dt["tanggal"] = pd.to_datetime(dt["tanggal"], errors="coerce")
+        dt_cube = dt.groupby(KEYS, observed=True)["duration"].sum()
+        cube = cube.join(dt_cube, how="outer")
+    else:
+        cube["duration"] = 0.0
+    cube = cube.fillna(0).reset_index()
+    cube["rows"] = cube["rows"].astype("int32")
+    cube["bulan"] = _period_codes(cube["tanggal"])
+    cube["tahun"] = (cube["bulan"] // 100).astype("int32")
+    return cube
+
+
+def period_mask(cube, selected_month=None, selected_year=None, month_col="bulan", year_col="tahun"):
+    """Mask baris untuk periode: bulan 'YYYY-MM', 'ALL'/None + tahun, atau semua.
+
+    Bekerja pada kolom kode integer (YYYYMM dan tahun), jadi bisa dipakai untuk cube
+    maupun frame OEE/downtime yang sudah di-compact (month_col="kode_bulan").
+    """
+    if selected_month and str(selected_month) != "ALL":
+        try:
+            code = int(str(selected_month).replace("-", "")[:6])
+        except ValueError:
+            return np.zeros(len(cube), dtype=bool)
+        return cube[month_col].to_numpy() == code
+    if selected_year:
+        try:
+            return cube[year_col].to_numpy() == int(selected_year)
+        except ValueError:
+            return np.zeros(len(cube), dtype=bool)
+    return np.ones(len(cube), dtype=bool)
+
+
+def rollup(cube, mask=None, by=("line", "tanggal")):
+    """Jumlahkan MEASURES per grup `by` (mis. ('line','tanggal') atau ('line','bulan'))."""
+    sub = cube if mask is None else cube[mask]
+    return sub.groupby(list(by), sort=True, observed=True)[MEASURES].sum().reset_index()
+
+
+def rollup_by_line(cube, selected_month=None, selected_year=None, by="tanggal"):
+    """Dict line -> frame per `by` (tanggal/bulan) untuk periode terpilih.
+
+    Hanya grup yang punya baris OEE (rows > 0) yang ikut, sama seperti agregat harian.
+    """
+    agg = rollup(cube, period_mask(cube, selected_month, selected_year), by=("line", by))
+    agg = agg[agg["rows"] > 0]
+    return {str(line): part.reset_index(drop=True) for line, part in agg.groupby("line", sort=True, observed=True)}
+
+
+# --- Pareto: durasi downtime per (line, bulan, kategori) dengan kode bulan integer ---
+def build_pareto(downtime_summary):
+    if downtime_summary.empty or "bulan" not in downtime_summary.columns:
+        return pd.DataFrame(columns=["line", "kategori", "duration", "bulan", "tahun"])
+    pareto = downtime_summary[["line", "kategori", "duration"]].copy()
+    pareto["line"] = pareto["line"].astype("category")
+    bulan = downtime_summary["bulan"]
+    pareto["bulan"] = (bulan.dt.year * 100 + bulan.dt.month).fillna(0).astype("int32")
+    pareto["tahun"] = (pareto["bulan"] // 100).astype("int32")
+    return pareto.reset_index(drop=True)
+
+
+def pareto_by_line(pareto, selected_month=None, selected_year=None):
+    """Dict line -> frame (kategori, duration) urut durasi terbesar, untuk periode terpilih."""
+    sub = pareto[period_mask(pareto, selected_month, selected_year)]
+    agg = sub.groupby(["line", "kategori"], sort=False, observed=True)["duration"].sum().reset_index()
+    agg = agg.sort_values(["line", "duration"], ascending=[True, False])
+    return {str(line): part[["kategori", "duration"]].reset_index(drop=True) for line, part in agg.groupby("line", sort=True, observed=True)}
+
+
+def line_names(cube):
+    """Daftar line (str) yang punya baris OEE di cube, urut seperti rollup_by_line."""
+    if cube.empty:
+        return []
+    return sorted(set(cube.loc[cube["rows"] > 0, "line"].astype(str)))
+
+
+# --- Agregat ringkas untuk filter periode di browser (dcc.Store period-data, lihat assets/dashboard.js) ---
+def typed_array(values, dtype=None):
+    """Encode array numerik sebagai {"dtype", "bdata"} (base64, little-endian) seperti typed array plotly.
+
+    Tanpa dtype: integer terkecil (int8/16/32) yang muat jika semua nilai bulat, selain itu
+    float64. Di browser didekode menjadi typed array (lihat typed() di assets/dashboard.js).
+    """
+    values = np.asarray(values)
+    if dtype is None:
+        as_float = values.astype("float64")
+        dtype = "f8"
+        if np.all(np.isfinite(as_float)) and np.all(as_float == np.round(as_float)):
+            peak = np.abs(as_float).max() if as_float.size else 0
+            for code, limit in (("i1", 2 ** 7), ("i2", 2 ** 15), ("i4", 2 ** 31)):
+                if peak < limit:
+                    dtype = code
+                    break
+    data = np.ascontiguousarray(values.astype("<" + dtype))
+    return {"dtype": dtype, "bdata": base64.b64encode(data.tobytes()).decode("ascii")}
+
+
+def client_aggregate(cube, pareto, months, render=None):
+    """Dict kolom ringkas per line: harian (d=YYYYMMDD, g, x=defect, l, m, t=downtime, r=rows)
+    dan pareto (b=YYYYMM, k=index kategori, v=durasi), plus daftar bulan 'YYYY-MM' untuk dropdown
+    dan opsi render tren (`render`). Kolom numerik dikirim sebagai typed array (typed_array).
+
+    Hari tanpa baris OEE (r == 0) ikut dikirim: mode bulanan menjumlahkan downtime-nya,
+    sama seperti rollup_by_line(by="bulan").
+    """
+    data = {"months": list(months), "lines": {}, "kategori": [], "pareto": {}, "render": render or {}}
+    if not cube.empty:
+        daily = rollup(cube, None, by=("line", "tanggal"))
+        daily = daily[daily["tanggal"].notna()]
+        day = daily["tanggal"]
+        daily = daily.assign(d=(day.dt.year * 10000 + day.dt.month * 100 + day.dt.day).astype("int64"))
+        for line, part in daily.groupby("line", sort=True, observed=True):
+            data["lines"][str(line)] = {
+                "d": typed_array(part["d"], "i4"),
+                "g": typed_array(part["good product output"]),
+                "x": typed_array(part["hold & all defect"]),
+                "l": typed_array(part["loading time"]),
+                "m": typed_array(part["output maksimal"]),
+                "t": typed_array(part["duration"]),
+                "r": typed_array(part["rows"]),
+            }
+    if not pareto.empty:
+        kategori = pareto["kategori"].astype(str)
+        names = sorted(kategori.unique())
+        codes = pd.Categorical(kategori, categories=names).codes
+        data["kategori"] = names
+        frame = pareto.assign(k=codes)
+        for line, part in frame.groupby("line", sort=True, observed=True):
+            data["pareto"][str(line)] = {
+                "b": typed_array(part["bulan"], "i4"),
+                "k": typed_array(part["k"]),
+                "v": typed_array(part["duration"]),
+            }
+    return data
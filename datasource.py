@@ -0,0 +1,455 @@
+import os
+import sqlite3
+import threading
+import time
+import pandas as pd
+
+# --- Konfigurasi default ---
+SHEET_URL = "https://docs.google.com/spreadsheets/d/13wz2xkVIdJqLdZ9UbUVtFrecnxuMS8Z0QLdoTjF-wLg/edit#gid=0"
+CREDENTIALS_FILE = "credentials.json"
+SCOPE = ["https://spreadsheets.google.com/feeds",
+         "https://www.googleapis.com/auth/drive"]
+# Header worksheet asli (urutan kolom sama dengan baris yang ditulis halaman input)
+SHEET_HEADERS = {
+    "oee": ["tanggal", "line", "shift", "sku", "loading time", "output maksimal",
+            "good product output", "hold & all defect", "user"],
+    "downtime": ["tanggal", "sku", "shift", "line", "start", "finish", "downtime",
+                 "kategori", "workcenter", "proses", "equipment", "user"],
+}
+# Umur maksimum client sebelum authorize ulang (detik); token OAuth berlaku ~1 jam
+CLIENT_MAX_AGE = int(os.environ.get("OEE_SHEETS_CLIENT_MAX_AGE", "3000"))
+
+
+class DataSource:
+    """Interface sumber data OEE: satu worksheet = satu tabel.
+
+    read(sheet_name) -> DataFrame dengan header baris pertama sebagai kolom
+    append_row(sheet_name, row) -> tambahkan satu baris (list) di akhir tabel
+    append_rows(sheet_name, rows) -> tambahkan banyak baris sekaligus
+    read_since(sheet_name, offset) -> hanya baris data ke-offset dst. (sheet append-only)
+    """
+
+    def read(self, sheet_name):
+        raise NotImplementedError
+
+    def read_since(self, sheet_name, offset):
+        # default: baca penuh lalu potong; backend yang bisa baca sebagian meng-override ini
+        return self.read(sheet_name).iloc[offset:].reset_index(drop=True)
+
+    def append_row(self, sheet_name, row):
+        raise NotImplementedError
+
+    def append_rows(self, sheet_name, rows):
+        # default: satu per satu; backend yang mendukung batch meng-override ini
+        for row in rows:
+            self.append_row(sheet_name, row)
+
+
+# --- Pool client Google Sheets (satu per proses) ---
+class SheetsPool:
+    """Client gspread + handle worksheet yang dipakai ulang selama proses hidup.
+
+    authorize & open_by_url hanya dilakukan sekali; sesudahnya setiap read/write
+    langsung memakai handle worksheet yang sudah di-cache (satu API call).
+    Client dibuat ulang bila sudah melewati CLIENT_MAX_AGE atau setelah error
+    autentikasi/koneksi (lazy reconnect, lihat call()). Setiap request ke Sheets,
+    termasuk lookup handle dan percobaan ulang, mengambil token scheduler sendiri.
+    """
+
+    def __init__(self, credentials_file=CREDENTIALS_FILE, max_age=CLIENT_MAX_AGE):
+        self.credentials_file = credentials_file
+        self.max_age = max_age
+        self._lock = threading.Lock()
+        self._client = None
+        self._created = 0.0
+        self._spreadsheets = {}
+        self._worksheets = {}
+
+    def _authorize(self):
+        import gspread
+        from oauth2client.service_account import ServiceAccountCredentials
+        creds = ServiceAccountCredentials.from_json_keyfile_name(self.credentials_file, SCOPE)
+        self._client = gspread.authorize(creds)
+        self._created = time.monotonic()
+        self._spreadsheets.clear()
+        self._worksheets.clear()
+
+    def client(self):
+        with self._lock:
+            if self._client is None or time.monotonic() - self._created > self.max_age:
+                self._authorize()
+            return self._client
+
+    def worksheet(self, sheet_url, sheet_name, kind="read"):
+        """Handle worksheet dari cache; jika belum ada, open_by_url dan lookup worksheet
+        masing-masing dikirim sebagai request terpisah lewat scheduler."""
+        client = self.client()
+        key = (sheet_url, sheet_name)
+        with self._lock:
+            ws = self._worksheets.get(key)
+            spreadsheet = self._spreadsheets.get(sheet_url)
+        if ws is not None:
+            return ws
+        if spreadsheet is None:
+            spreadsheet = self._request(sheet_name, lambda: client.open_by_url(sheet_url), kind,
+                                        key=("open_by_url", sheet_url))
+            with self._lock:
+                if self._client is client:
+                    spreadsheet = self._spreadsheets.setdefault(sheet_url, spreadsheet)
+        ws = self._request(sheet_name, lambda: spreadsheet.worksheet(sheet_name), kind,
+                           key=("worksheet", sheet_url, sheet_name))
+        with self._lock:
+            # jangan simpan handle dari client yang sudah di-reset di tengah lookup
+            if self._client is client:
+                ws = self._worksheets.setdefault(key, ws)
+        return ws
+
+    def reset(self):
+        with self._lock:
+            self._client = None
+            self._spreadsheets.clear()
+            self._worksheets.clear()
+
+    def call(self, sheet_url, sheet_name, fn, kind="read", key=None, rows=None):
+        """Jalankan fn(worksheet) lewat scheduler kuota; bila gagal karena auth/koneksi, reconnect
+        lalu coba sekali lagi sebagai request baru (token baru, lookup handle juga lewat scheduler).
+
+        Write hanya diulang jika ditolak auth (401/403, pasti belum tertulis). Putus koneksi /
+        timeout saat write tetap di-raise setelah reconnect: baris mungkin sudah masuk, jadi
+        pemanggil (outbox) yang memutuskan, bukan dikirim ulang diam-diam.
+
+        kind: "read" / "write" (write didahulukan); key: read dengan key sama yang
+        sedang berjalan digabung jadi satu request (lihat sheets_scheduler.py).
+        rows: opsional, rows(hasil) -> jumlah baris yang dibaca/ditulis, untuk metrik.
+        """
+        if key is not None:
+            key = (sheet_url, sheet_name) + tuple(key)
+        try:
+            ws = self.worksheet(sheet_url, sheet_name, kind)
+            return self._request(sheet_name, lambda: fn(ws), kind, key, rows)
+        except Exception as exc:
+            if not _is_reconnectable(exc):
+                raise
+            self.reset()
+            if kind == "write" and not _is_auth_error(exc):
+                raise
+            ws = self.worksheet(sheet_url, sheet_name, kind)
+            return self._request(sheet_name, lambda: fn(ws), kind, key, rows)
+
+    def _request(self, sheet_name, fn, kind="read", key=None, rows=None):
+        """Satu request Sheets = satu token scheduler, dengan metrik latency/baris/error."""
+        from sheets_scheduler import get_scheduler
+        return get_scheduler().call(lambda: self._timed_call(sheet_name, fn, kind, rows), kind=kind, key=key)
+
+    def _timed_call(self, sheet_name, fn, kind, rows):
+        from metrics import SHEETS_SECONDS, SHEETS_ROWS, SHEETS_ERRORS
+        started = time.perf_counter()
+        try:
+            result = fn()
+        except Exception:
+            SHEETS_ERRORS.inc(kind=kind, sheet=sheet_name)
+            raise
+        finally:
+            SHEETS_SECONDS.observe(time.perf_counter() - started, kind=kind, sheet=sheet_name)
+        if rows is not None:
+            SHEETS_ROWS.observe(rows(result), kind=kind, sheet=sheet_name)
+        return result
+
+
+def _is_auth_error(exc):
+    from gspread.exceptions import APIError
+    return isinstance(exc, APIError) and getattr(exc.response, "status_code", None) in (401, 403)
+
+
+def _is_reconnectable(exc):
+    import requests
+    return _is_auth_error(exc) or isinstance(exc, (requests.ConnectionError, requests.Timeout))
+
+
+class LocalSheetsPool(SheetsPool):
+    """SheetsPool tanpa Google: handle worksheet = nama sheet, reset hanya dihitung.
+
+    Scheduler kuota, retry reconnect dan metrik tetap jalur asli SheetsPool.call,
+    dipakai FlakySheetSource agar benchmark menguji perilaku retry produksi.
+    """
+
+    def __init__(self):
+        super().__init__(credentials_file=None)
+        self.resets = 0
+
+    def worksheet(self, sheet_url, sheet_name, kind="read"):
+        return sheet_name
+
+    def reset(self):
+        self.resets += 1
+        super().reset()
+
+
+_pools = {}
+_pools_lock = threading.Lock()
+
+
+def get_sheets_pool(credentials_file=CREDENTIALS_FILE):
+    with _pools_lock:
+        pool = _pools.get(credentials_file)
+        if pool is None:
+            pool = _pools[credentials_file] = SheetsPool(credentials_file)
+        return pool
+
+
+# --- Google Sheets (produksi) ---
+class GoogleSheetSource(DataSource):
+    def __init__(self, sheet_url=SHEET_URL, credentials_file=CREDENTIALS_FILE):
+        self.sheet_url = sheet_url
+        self.pool = get_sheets_pool(credentials_file)
+        # lebar header terakhir per sheet: hanya untuk batas kolom range, header sendiri selalu dibaca ulang
+        self._widths = {}
+
+    def worksheet(self, sheet_name):
+        return self.pool.worksheet(self.sheet_url, sheet_name)
+
+    def read(self, sheet_name):
+        records = self.pool.call(self.sheet_url, sheet_name, lambda ws: ws.get_all_records(),
+                                 key=("get_all_records",), rows=len)
+        return pd.DataFrame(records)
+
+    def read_since(self, sheet_name, offset):
+        """Ambil header + hanya range baris baru (A{offset+2}:<kolom terakhir>) dalam satu batch_get.
+
+        Header dibaca ulang setiap kali, jadi kolom baru langsung terlihat (IncrementalBuilder
+        lalu reload penuh sekali). Batas kolom range memakai lebar header terakhir; jika header
+        ternyata melebar, range dibaca ulang sekali dengan lebar baru (request terpisah).
+        """
+        from gspread.exceptions import APIError
+        from gspread.utils import numericise_all, rowcol_to_a1
+
+        def fetch(width):
+            last_col = rowcol_to_a1(1, max(width, 1)).rstrip("0123456789")
+            header, values = self.pool.call(
+                self.sheet_url, sheet_name, lambda ws: ws.batch_get(["1:1", f"A{offset + 2}:{last_col}"]),
+                key=("read_since", offset, last_col), rows=lambda result: len(result[1]))
+            return (list(header[0]) if header else []), list(values)
+
+        width = self._widths.get(sheet_name, 1)
+        try:
+            header, values = fetch(width)
+        except APIError as exc:
+            # kolom dihapus: range lama bisa melewati batas grid -> ulangi dari lebar 1
+            if width <= 1 or getattr(exc.response, "status_code", None) != 400:
+                raise
+            width = 1
+            header, values = fetch(width)
+        if len(header) > width:
+            header, values = fetch(len(header))
+        self._widths[sheet_name] = width = len(header)
+        # samakan dengan get_all_records: angka di-numericise, sel kosong jadi ""
+        rows = [(numericise_all(r) + [""] * width)[:width] for r in values]
+        return pd.DataFrame(rows, columns=header)
+
+    def append_row(self, sheet_name, row):
+        self.pool.call(self.sheet_url, sheet_name, lambda ws: ws.append_row(row), kind="write",
+                       rows=lambda _: 1)
+
+    def append_rows(self, sheet_name, rows):
+        # satu request values.append untuk semua baris
+        if rows:
+            self.pool.call(self.sheet_url, sheet_name, lambda ws: ws.append_rows(rows), kind="write",
+                           rows=lambda _: len(rows))
+
+
+# --- File lokal: Parquet (satu file per sheet) atau SQLite (satu tabel per sheet) ---
+class LocalSource(DataSource):
+    """Backend lokal untuk dev box / PC line tanpa internet.
+
+    path berakhiran .db/.sqlite/.sqlite3 -> SQLite, selain itu dianggap folder
+    berisi <sheet>.parquet (butuh pyarrow).
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.is_sqlite = str(path).lower().endswith((".db", ".sqlite", ".sqlite3"))
+
+    def _parquet_path(self, sheet_name):
+        return os.path.join(self.path, f"{sheet_name}.parquet")
+
+    def read(self, sheet_name):
+        if self.is_sqlite:
+            if not os.path.exists(self.path):
+                return pd.DataFrame()
+            with sqlite3.connect(self.path) as conn:
+                exists = conn.execute(
+                    "SELECT 1 FROM sqlite_master WHERE type='table' AND name=?", (sheet_name,)
+                ).fetchone()
+                if not exists:
+                    return pd.DataFrame()
+                return pd.read_sql_query(f'SELECT * FROM "{sheet_name}"', conn)
+        fpath = self._parquet_path(sheet_name)
+        if not os.path.exists(fpath):
+            return pd.DataFrame()
+        return pd.read_parquet(fpath)
+
+    def read_since(self, sheet_name, offset):
+        if not self.is_sqlite or not os.path.exists(self.path):
+            return super().read_since(sheet_name, offset)
+        with sqlite3.connect(self.path) as conn:
+            exists = conn.execute(
+                "SELECT 1 FROM sqlite_master WHERE type='table' AND name=?", (sheet_name,)
+            ).fetchone()
+            if not exists:
+                return pd.DataFrame()
+            return pd.read_sql_query(
+                f'SELECT * FROM "{sheet_name}" ORDER BY rowid LIMIT -1 OFFSET ?', conn, params=(offset,)
+            )
+
+    def write(self, sheet_name, df):
+        """Tulis ulang seluruh tabel (dipakai untuk export dari Sheets)."""
+        if self.is_sqlite:
+            with sqlite3.connect(self.path) as conn:
+                df.to_sql(sheet_name, conn, if_exists="replace", index=False)
+        else:
+            os.makedirs(self.path, exist_ok=True)
+            df.to_parquet(self._parquet_path(sheet_name), index=False)
+
+    def append_row(self, sheet_name, row):
+        self.append_rows(sheet_name, [row])
+
+    def append_rows(self, sheet_name, rows):
+        if not rows:
+            return
+        current = self.read(sheet_name)
+        if current.empty and len(current.columns) == 0:
+            raise ValueError(f"Tabel '{sheet_name}' belum ada di {self.path}; header tidak diketahui.")
+        width = len(current.columns)
+        new = pd.DataFrame([(list(r) + [None] * width)[:width] for r in rows], columns=current.columns)
+        if self.is_sqlite:
+            with sqlite3.connect(self.path) as conn:
+                new.to_sql(sheet_name, conn, if_exists="append", index=False)
+        else:
+            self.write(sheet_name, pd.concat([current, new], ignore_index=True))
+
+
+# --- Stand-in Google Sheets di memori (untuk benchmark / dev) ---
+class FakeSheetSource(DataSource):
+    """Meniru worksheet Google Sheets: header + list baris, semua di memori."""
+
+    def __init__(self, sheets=None):
+        # sheets: {"oee": DataFrame atau {"header": [...], "rows": [[...], ...]}}
+        self.sheets = {}
+        for name, data in (sheets or {}).items():
+            self.load(name, data)
+
+    def load(self, sheet_name, data):
+        if isinstance(data, pd.DataFrame):
+            data = {"header": list(data.columns), "rows": data.values.tolist()}
+        self.sheets[sheet_name] = {"header": list(data["header"]), "rows": [list(r) for r in data["rows"]]}
+
+    def read(self, sheet_name):
+        sheet = self.sheets.get(sheet_name)
+        if sheet is None:
+            return pd.DataFrame()
+        return pd.DataFrame(sheet["rows"], columns=sheet["header"])
+
+    def read_since(self, sheet_name, offset):
+        sheet = self.sheets.get(sheet_name)
+        if sheet is None:
+            return pd.DataFrame()
+        return pd.DataFrame(sheet["rows"][offset:], columns=sheet["header"])
+
+    def append_row(self, sheet_name, row):
+        self.append_rows(sheet_name, [row])
+
+    def append_rows(self, sheet_name, rows):
+        sheet = self.sheets.get(sheet_name)
+        if sheet is None:
+            raise ValueError(f"Worksheet '{sheet_name}' belum ada di FakeSheetSource; header tidak diketahui.")
+        width = len(sheet["header"])
+        sheet["rows"].extend((list(r) + [""] * width)[:width] for r in rows)
+
+
+class FlakySheetSource(FakeSheetSource):
+    """FakeSheetSource yang meniru Sheets bermasalah, untuk menguji flush outbox.
+
+    fail_rate: peluang append gagal sebelum menulis (koneksi ditolak);
+    lost_response_rate: peluang baris tertulis tapi respons hilang (timeout);
+    latency: jeda per request (detik). append_calls/read_calls menghitung request.
+    Setiap request lewat LocalSheetsPool.call dan error-nya exception requests, jadi
+    reconnect/retry yang diuji sama dengan GoogleSheetSource.
+    """
+
+    def __init__(self, sheets=None, fail_rate=0.2, lost_response_rate=0.1, latency=0.0, seed=None):
+        super().__init__(sheets)
+        import random
+        self.fail_rate = fail_rate
+        self.lost_response_rate = lost_response_rate
+        self.latency = latency
+        self._random = random.Random(seed)
+        self.append_calls = 0
+        self.read_calls = 0
+        self.pool = LocalSheetsPool()
+
+    def read(self, sheet_name):
+        return self.pool.call(None, sheet_name, self._read, key=("read",), rows=len)
+
+    def _read(self, sheet_name):
+        self.read_calls += 1
+        if self.latency:
+            time.sleep(self.latency)
+        return super().read(sheet_name)
+
+    def append_rows(self, sheet_name, rows):
+        self.pool.call(None, sheet_name, lambda ws: self._append_rows(ws, rows), kind="write",
+                       rows=lambda _: len(rows))
+
+    def _append_rows(self, sheet_name, rows):
+        import requests
+        self.append_calls += 1
+        if self.latency:
+            time.sleep(self.latency)
+        roll = self._random.random()
+        if roll < self.fail_rate:
+            raise requests.ConnectionError("simulasi Sheets: koneksi ditolak, tidak ada baris yang ditulis")
+        super().append_rows(sheet_name, rows)
+        if roll < self.fail_rate + self.lost_response_rate:
+            raise requests.ReadTimeout("simulasi Sheets: baris tertulis tapi respons hilang")
+
+
+# --- Pemilihan backend ---
+_source = None
+
+
+def make_data_source(spec=None):
+    """Buat backend dari spec: 'gsheet' (default), 'fake', 'local:<path>'.
+
+    Tanpa spec, dibaca dari environment variable OEE_DATA_SOURCE.
+    """
+    spec = spec or os.environ.get("OEE_DATA_SOURCE", "gsheet")
+    if spec == "gsheet":
+        return GoogleSheetSource()
+    if spec == "fake":
+        # worksheet kosong dengan header asli: submit + dashboard bisa dicoba end-to-end
+        return FakeSheetSource({name: {"header": header, "rows": []} for name, header in SHEET_HEADERS.items()})
+    if spec.startswith("local:"):
+        return LocalSource(spec[len("local:"):])
+    raise ValueError(f"OEE_DATA_SOURCE tidak dikenal: {spec}")
+
+
+def get_data_source():
+    global _source
+    if _source is None:
+        _source = make_data_source()
+    return _source
+
+
+def set_data_source(source):
+    """Ganti backend aktif (mis. FakeSheetSource saat benchmark)."""
+    global _source
+    _source = source
+
+
+def export_to_local(path, sheet_names=("oee", "downtime"), source=None):
+    """Salin worksheet dari backend aktif ke file lokal (Parquet/SQLite)."""
+    source = source or get_data_source()
+    target = LocalSource(path)
+    for name in sheet_names:
+        target.write(name, source.read(name))
+    return target
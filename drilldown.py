@@ -0,0 +1,89 @@
+import numpy as np
+import pandas as pd
+
+
+def _positions(frame, keys, by_day=False):
+    """Dict key -> array posisi baris; by_day menambahkan tanggal (tanpa jam) sebagai key terakhir."""
+    if frame.empty or any(k not in frame.columns for k in keys) or (by_day and "tanggal" not in frame.columns):
+        return {}
+    groupers = [frame[k] for k in keys]
+    if by_day:
+        groupers.append(frame["tanggal"].dt.normalize())
+    return frame.groupby(groupers, observed=True, sort=False).indices
+
+
+class DrilldownIndex:
+    """Index posisi baris snapshot untuk drill-down modal dashboard.
+
+    Dibangun sekali per snapshot: (line, hari) -> baris OEE, (line, hari) -> baris
+    downtime, dan (line, kategori, kode bulan) -> baris downtime. Lookup hanya
+    mengambil baris hasil (O(ukuran hasil)), tanpa memindai seluruh frame.
+    """
+
+    def __init__(self, df, df_downtime):
+        self.df = df
+        self.df_downtime = df_downtime
+        self._oee_by_day = _positions(df, ["line"], by_day=True)
+        self._downtime_by_day = _positions(df_downtime, ["line"], by_day=True)
+        self._downtime_by_kategori = _positions(df_downtime, ["line", "kategori", "kode_bulan"])
+        self.months = sorted({key[2] for key in self._downtime_by_kategori})
+
+    @staticmethod
+    def _take(frame, index, keys):
+        parts = [index[k] for k in keys if k in index]
+        if not parts:
+            return frame.iloc[0:0]
+        positions = parts[0] if len(parts) == 1 else np.sort(np.concatenate(parts))
+        return frame.iloc[positions]
+
+    def oee_day(self, line, day):
+        return self._take(self.df, self._oee_by_day, [(str(line), pd.Timestamp(day).normalize())])
+
+    def downtime_day(self, line, day):
+        return self._take(self.df_downtime, self._downtime_by_day, [(str(line), pd.Timestamp(day).normalize())])
+
+    def downtime_kategori(self, line, kategori, selected_month=None, selected_year=None):
+        """Baris downtime satu kategori; periode sama seperti cube.period_mask (bulan, tahun, atau semua)."""
+        codes = self.months
+        try:
+            if selected_month and str(selected_month) != "ALL":
+                codes = [int(str(selected_month).replace("-", "")[:6])]
+            elif selected_year:
+                codes = [c for c in self.months if c // 100 == int(selected_year)]
+        except ValueError:
+            codes = []
+        return self._take(self.df_downtime, self._downtime_by_kategori, [(str(line), kategori, c) for c in codes])
+
+
+# --- Tabel downtime di modal: diformat vektor, dipotong per halaman di server ---
+DOWNTIME_TABLE_PAGE_SIZE = 15
+
+
+def sort_and_page(frame, sort_by=None, page_current=0, page_size=DOWNTIME_TABLE_PAGE_SIZE):
+    """Urutkan (sort_by format DataTable) pada nilai asli kolom, lalu ambil satu halaman."""
+    sort_by = [s for s in (sort_by or []) if s.get("column_id") in frame.columns]
+    if sort_by:
+        frame = frame.sort_values([s["column_id"] for s in sort_by],
+                                  ascending=[s.get("direction") != "desc" for s in sort_by],
+                                  kind="mergesort", na_position="last")
+    start = max(int(page_current or 0), 0) * page_size
+    return frame.iloc[start:start + page_size]
+
+
+def format_downtime_rows(frame, columns):
+    """List dict untuk DataTable: tanggal YYYY-MM-DD, start/finish HH:MM:SS, sisanya apa adanya."""
+    out = {}
+    for col in columns:
+        if col not in frame.columns:
+            out[col] = [""] * len(frame)
+            continue
+        values = frame[col]
+        if col == "tanggal":
+            values = pd.to_datetime(values, errors="coerce").dt.strftime("%Y-%m-%d")
+        elif col in ("start", "finish"):
+            parsed = pd.to_datetime(values, errors="coerce") if values.dtype.kind != "M" else values
+            # nilai yang tidak bisa di-parse ditampilkan apa adanya
+            values = parsed.dt.strftime("%H:%M:%S").where(parsed.notna(), values.astype(object))
+        # tolist() -> tipe Python (float/str), aman untuk JSON
+        out[col] = ["" if pd.isna(v) else v for v in values.tolist()]
+    return [dict(zip(columns, row)) for row in zip(*(out[c] for c in columns))]
@@ -0,0 +1,18 @@
+import os
+
+# Registry line produksi, urut tampilan di form input dan dashboard. Tambah line cukup lewat env, tanpa ubah kode:
+#   OEE_LINES="1,1b,2,3"
+LINES = [ln.strip() for ln in os.environ.get("OEE_LINES", "1,1b,2").split(",") if ln.strip()]
+# Slot SKU per line: (id slot di komponen, label di form dan pesan status)
+SKU_SLOTS = [("a", "A"), ("b", "B")]
+
+
+def line_skus():
+    """List (line, slot, label) untuk semua kombinasi line x SKU, urut tampilan."""
+    return [(ln, slot, label) for ln in LINES for slot, label in SKU_SLOTS]
+
+
+def ordered_lines(names):
+    """Urutkan nama line: urutan LINES dulu, line lain (mis. hanya ada di data lama) menyusul urut abjad."""
+    rank = {ln: i for i, ln in enumerate(LINES)}
+    return sorted(names, key=lambda ln: (rank.get(ln, len(rank)), ln))
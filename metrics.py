@@ -0,0 +1,380 @@
+import os
+import sys
+import json
+import time
+import threading
+import logging
+
+logger = logging.getLogger(__name__)
+
+# Folder file metrik per proses (worker gunicorn, job background); /metrics menjumlahkan semuanya.
+# String kosong -> metrik hanya dari proses yang melayani scrape.
+METRICS_DIR = os.environ.get("OEE_METRICS_DIR",
+                             os.path.join(os.path.dirname(os.path.abspath(__file__)), ".metrics"))
+# Paling sering sekali per interval ini (detik) sebuah proses menulis file metriknya
+METRICS_WRITE_INTERVAL = float(os.environ.get("OEE_METRICS_WRITE_INTERVAL", "5"))
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+BYTES_BUCKETS = (256, 1024, 4096, 16384, 65536, 262144, 1048576, 4194304, 16777216)
+ROWS_BUCKETS = (1, 10, 100, 1000, 10000, 100000, 1000000)
+
+
+class Counter:
+    def __init__(self, registry, name, doc, labels):
+        self.registry = registry
+        self.name = name
+        self.doc = doc
+        self.labels = tuple(labels)
+        self.kind = "counter"
+
+    def _key(self, labels):
+        return tuple(str(labels.get(label, "")) for label in self.labels)
+
+    def inc(self, amount=1, **labels):
+        self.registry._update(self.name, self._key(labels), lambda value: (value or 0) + amount)
+
+
+class Histogram(Counter):
+    def __init__(self, registry, name, doc, labels, buckets):
+        super().__init__(registry, name, doc, labels)
+        self.buckets = tuple(buckets)
+        self.kind = "histogram"
+
+    def observe(self, value, **labels):
+        # nilai: jumlah per bucket (tidak kumulatif, terakhir = +Inf) lalu sum
+        index = next((i for i, bound in enumerate(self.buckets) if value <= bound), len(self.buckets))
+
+        def add(current):
+            current = current or [0] * (len(self.buckets) + 1) + [0.0]
+            current[index] += 1
+            current[-1] += value
+            return current
+
+        self.registry._update(self.name, self._key(labels), add)
+
+
+class Registry:
+    """Counter & histogram format teks Prometheus, tanpa dependensi.
+
+    Nilai dicatat per proses. Jika directory diisi, setiap proses menulis nilainya
+    ke <directory>/<pid>.json (paling sering tiap METRICS_WRITE_INTERVAL) dan
+    render() menjumlahkan semua file; file proses yang sudah mati digabung ke
+    archive.json supaya counter tidak turun. Gauge (collector) dihitung saat scrape
+    dari proses yang melayani request.
+    """
+
+    def __init__(self, directory=METRICS_DIR):
+        self.directory = directory
+        self._lock = threading.Lock()
+        self._metrics = {}
+        self._values = {}
+        self._collectors = []
+        self._pid = os.getpid()
+        self._written = 0.0
+
+    def counter(self, name, doc, labels=()):
+        return self._register(Counter(self, name, doc, labels))
+
+    def histogram(self, name, doc, labels=(), buckets=LATENCY_BUCKETS):
+        return self._register(Histogram(self, name, doc, labels, buckets))
+
+    def collector(self, fn):
+        """Daftarkan fn() -> list (nama, doc, [(labels, nilai), ...]) untuk gauge saat scrape."""
+        self._collectors.append(fn)
+        return fn
+
+    def _register(self, metric):
+        self._metrics[metric.name] = metric
+        return metric
+
+    def _update(self, name, key, fn):
+        with self._lock:
+            if self._pid != os.getpid():
+                # proses hasil fork (job background): mulai dari nol, nilai induk ada di file induk
+                self._values = {}
+                self._pid = os.getpid()
+                self._written = 0.0
+            values = self._values.setdefault(name, {})
+            values[key] = fn(values.get(key))
+            due = bool(self.directory) and time.time() - self._written >= METRICS_WRITE_INTERVAL
+            if due:
+                self._written = time.time()
+        if due:
+            self.write()
+
+    def _dump(self):
+        with self._lock:
+            if self._pid != os.getpid():
+                return os.getpid(), {}
+            return self._pid, _entries(self._values)
+
+    def write(self):
+        """Tulis nilai proses ini ke file (dipanggil otomatis; panggil manual sebelum proses selesai)."""
+        if not self.directory:
+            return
+        pid, data = self._dump()
+        try:
+            os.makedirs(self.directory, exist_ok=True)
+            _write_json(os.path.join(self.directory, "%d.json" % pid), data)
+        except OSError:
+            logger.warning("Metrik tidak bisa ditulis ke %s", self.directory, exc_info=True)
+
+    def _collect_files(self):
+        merged = {}
+        lock_fd = None
+        try:
+            import fcntl
+        except ImportError:
+            fcntl = None
+        try:
+            lock_fd = os.open(os.path.join(self.directory, ".lock"), os.O_RDWR | os.O_CREAT, 0o644)
+            if fcntl is not None:
+                fcntl.flock(lock_fd, fcntl.LOCK_EX)
+            archive_path = os.path.join(self.directory, "archive.json")
+            archive = _merge({}, _read_json(archive_path))
+            dead = []
+            for entry in os.listdir(self.directory):
+                stem, ext = os.path.splitext(entry)
+                if ext != ".json" or not stem.isdigit():
+                    continue
+                path = os.path.join(self.directory, entry)
+                data = _read_json(path)
+                if int(stem) != os.getpid() and not _alive(int(stem)):
+                    _merge(archive, data)
+                    dead.append(path)
+                else:
+                    _merge(merged, data)
+            if dead:
+                _write_json(archive_path, _entries(archive))
+                for path in dead:
+                    os.unlink(path)
+            _merge(merged, _entries(archive))
+        finally:
+            if lock_fd is not None:
+                os.close(lock_fd)  # menutup fd melepas flock
+        return merged
+
+    def values(self):
+        """Nilai gabungan semua proses (atau proses ini saja jika tanpa directory / folder error)."""
+        if self.directory:
+            self.write()
+            try:
+                return self._collect_files()
+            except OSError:
+                logger.warning("Metrik proses lain tidak bisa dibaca dari %s", self.directory, exc_info=True)
+        merged = {}
+        _merge(merged, self._dump()[1])
+        return merged
+
+    def render(self):
+        """Semua metrik dalam format teks Prometheus."""
+        values = self.values()
+        lines = []
+        for name, metric in self._metrics.items():
+            lines += ["# HELP %s %s" % (name, metric.doc), "# TYPE %s %s" % (name, metric.kind)]
+            for key, value in sorted(values.get(name, {}).items()):
+                labels = list(zip(metric.labels, key))
+                if metric.kind == "counter":
+                    lines.append(_sample(name, labels, value))
+                    continue
+                cumulative = 0
+                for bound, count in zip(metric.buckets + ("+Inf",), value[:-1]):
+                    cumulative += count
+                    lines.append(_sample(name + "_bucket", labels + [("le", _number(bound))], cumulative))
+                lines.append(_sample(name + "_sum", labels, value[-1]))
+                lines.append(_sample(name + "_count", labels, cumulative))
+        for collect in self._collectors:
+            try:
+                gauges = collect()
+            except Exception:
+                logger.exception("Collector metrik %s gagal", getattr(collect, "__name__", collect))
+                continue
+            for name, doc, samples in gauges:
+                lines += ["# HELP %s %s" % (name, doc), "# TYPE %s gauge" % name]
+                lines += [_sample(name, sorted(labels.items()), value) for labels, value in samples]
+        return "\n".join(lines) + "\n"
+
+
+def _entries(values):
+    # {nama: {key: nilai}} -> format file {nama: [[key, nilai], ...]} (salinan)
+    return {name: [[list(key), list(value) if isinstance(value, list) else value] for key, value in entries.items()]
+            for name, entries in values.items()}
+
+
+def _merge(target, data):
+    for name, entries in data.items():
+        values = target.setdefault(name, {})
+        for key, value in entries:
+            key = tuple(key)
+            current = values.get(key)
+            if current is None:
+                values[key] = list(value) if isinstance(value, list) else value
+            elif isinstance(value, list):
+                values[key] = [a + b for a, b in zip(current, value)]
+            else:
+                values[key] = current + value
+    return target
+
+
+def _read_json(path):
+    try:
+        with open(path) as f:
+            data = json.load(f)
+    except (OSError, ValueError):
+        return {}
+    return data if isinstance(data, dict) else {}
+
+
+def _write_json(path, data):
+    tmp = "%s.%d.tmp" % (path, os.getpid())
+    with open(tmp, "w") as f:
+        json.dump(data, f)
+    os.replace(tmp, path)
+
+
+def _alive(pid):
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+def _number(value):
+    if isinstance(value, str):
+        return value
+    value = float(value)
+    return str(int(value)) if value.is_integer() and abs(value) < 1e15 else repr(value)
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _sample(name, labels, value):
+    text = ",".join('%s="%s"' % (label, _escape(v)) for label, v in labels)
+    return "%s%s %s" % (name, "{%s}" % text if text else "", _number(value))
+
+
+REGISTRY = Registry()
+
+# --- Callback Dash (diukur di server per request /_dash-update-component; callback clientside tidak lewat server) ---
+CALLBACK_SECONDS = REGISTRY.histogram(
+    "oee_callback_duration_seconds", "Durasi request callback Dash di server.", ("callback",))
+CALLBACK_REQUEST_BYTES = REGISTRY.histogram(
+    "oee_callback_request_bytes", "Ukuran body request callback Dash.", ("callback",), BYTES_BUCKETS)
+CALLBACK_RESPONSE_BYTES = REGISTRY.histogram(
+    "oee_callback_response_bytes", "Ukuran response callback Dash.", ("callback",), BYTES_BUCKETS)
+CALLBACK_ERRORS = REGISTRY.counter(
+    "oee_callback_errors_total", "Callback Dash yang berakhir dengan status 5xx.", ("callback",))
+
+# --- Google Sheets (lihat datasource.SheetsPool & sheets_scheduler.py) ---
+SHEETS_SECONDS = REGISTRY.histogram(
+    "oee_sheets_request_duration_seconds", "Durasi request Google Sheets (tanpa antri kuota).", ("kind", "sheet"))
+SHEETS_ROWS = REGISTRY.histogram(
+    "oee_sheets_request_rows", "Jumlah baris yang dibaca/ditulis per request Sheets.", ("kind", "sheet"), ROWS_BUCKETS)
+SHEETS_ERRORS = REGISTRY.counter(
+    "oee_sheets_errors_total", "Request Google Sheets yang gagal.", ("kind", "sheet"))
+SHEETS_WAIT_SECONDS = REGISTRY.histogram(
+    "oee_sheets_queue_wait_seconds", "Waktu tunggu kuota/antrian sebelum request Sheets dikirim.", ("kind",))
+SHEETS_THROTTLED = REGISTRY.counter(
+    "oee_sheets_throttled_total", "Request yang dibalas 429 oleh Sheets.", ("kind",))
+SHEETS_COALESCED = REGISTRY.counter(
+    "oee_sheets_coalesced_total", "Read yang digabung dengan read identik yang sedang berjalan.", ("kind",))
+
+# --- Snapshot & submit ---
+SNAPSHOT_REFRESH_SECONDS = REGISTRY.histogram(
+    "oee_snapshot_refresh_duration_seconds", "Durasi refresh snapshot dashboard.")
+SNAPSHOT_REFRESH_ERRORS = REGISTRY.counter(
+    "oee_snapshot_refresh_errors_total", "Refresh snapshot yang gagal (snapshot lama tetap dipakai).")
+SUBMIT_SECONDS = REGISTRY.histogram(
+    "oee_submit_duration_seconds", "Durasi submit form input (jurnal outbox + kirim ke Sheets).")
+
+
+def _callback_name(app, body):
+    # nama fungsi callback; output yang tidak terdaftar tidak dijadikan label (cardinality)
+    output = (body or {}).get("output") if isinstance(body, dict) else None
+    entry = app.callback_map.get(output) if output else None
+    return getattr((entry or {}).get("callback"), "__name__", None) or "unknown"
+
+
+def instrument_dash(app):
+    """Ukur setiap request callback Dash di server Flask: durasi, ukuran request/response, status 5xx."""
+    from flask import g, request
+    server = app.server
+
+    def record(status, response_bytes):
+        started = g.pop("oee_callback_started", None)
+        if started is None:
+            return
+        name = _callback_name(app, request.get_json(silent=True))
+        CALLBACK_SECONDS.observe(time.perf_counter() - started, callback=name)
+        CALLBACK_REQUEST_BYTES.observe(request.content_length or 0, callback=name)
+        if response_bytes is not None:
+            CALLBACK_RESPONSE_BYTES.observe(response_bytes, callback=name)
+        if status >= 500:
+            CALLBACK_ERRORS.inc(callback=name)
+
+    @server.before_request
+    def start_callback_timer():
+        if request.method == "POST" and request.path.endswith("/_dash-update-component"):
+            g.oee_callback_started = time.perf_counter()
+
+    @server.after_request
+    def record_callback(response):
+        record(response.status_code, response.content_length or 0)
+        return response
+
+    @server.teardown_request
+    def record_callback_exception(exc):
+        # after_request tidak jalan jika exception diteruskan (mode debug)
+        if exc is not None:
+            record(500, None)
+
+
+# --- Gauge saat scrape (proses yang melayani /metrics; tidak memicu load data) ---
+@REGISTRY.collector
+def snapshot_gauges():
+    snapshot = sys.modules.get("snapshot")
+    snap = getattr(snapshot, "_current", None)
+    if snap is None:
+        return []
+    return [
+        ("oee_snapshot_age_seconds", "Umur data snapshot sejak ditarik dari sumber.", [({}, snap.age)]),
+        ("oee_snapshot_version", "Versi snapshot yang sedang dilayani.", [({}, snap.version)]),
+        ("oee_snapshot_stale", "1 jika snapshot basi atau masih warm-start dari disk.", [({}, int(snap.is_stale))]),
+        ("oee_snapshot_rows", "Jumlah baris per frame snapshot.",
+         [({"frame": name}, len(frame)) for name, frame in snap.frames().items()]),
+        ("oee_snapshot_memory_bytes", "Memori frame snapshot.", [({}, snap.memory["total"])]),
+    ]
+
+
+@REGISTRY.collector
+def sheets_gauges():
+    scheduler = getattr(sys.modules.get("sheets_scheduler"), "_scheduler", None)
+    if scheduler is None:
+        return []
+    metrics = scheduler.metrics()
+    return [
+        ("oee_sheets_queue_depth", "Request Sheets yang sedang antri kuota.",
+         [({"kind": kind}, depth) for kind, depth in metrics["queue_depth"].items()]),
+        ("oee_sheets_inflight_reads", "Read Sheets yang sedang berjalan (key coalescing).",
+         [({}, metrics["inflight_reads"])]),
+    ]
+
+
+@REGISTRY.collector
+def outbox_gauges():
+    outbox = sys.modules.get("outbox")
+    if outbox is None:
+        return []
+    pending, oldest = outbox.get_outbox().pending_summary()
+    return [
+        ("oee_outbox_pending_rows", "Baris submit yang belum terkirim ke Sheets.", [({}, pending)]),
+        ("oee_outbox_oldest_pending_seconds", "Umur baris pending tertua di outbox.",
+         [({}, time.time() - oldest if oldest else 0)]),
+    ]
@@ -0,0 +1,302 @@
+import os
+import json
+import time
+import uuid
+import random
+import sqlite3
+import hashlib
+import logging
+import threading
+
+logger = logging.getLogger(__name__)
+
+# Outbox lokal (SQLite): setiap submit dijurnal dulu di sini, baru dikirim ke Sheets.
+# Dibagi semua worker gunicorn dan proses job background.
+OUTBOX_PATH = os.environ.get("OEE_OUTBOX_PATH",
+                             os.path.join(os.path.dirname(os.path.abspath(__file__)), ".outbox.db"))
+# Backoff kirim ulang: BASE * 2^(percobaan-1) detik, maksimal MAX, plus jitter
+OUTBOX_RETRY_BASE = float(os.environ.get("OEE_OUTBOX_RETRY_BASE", "2"))
+OUTBOX_RETRY_MAX = float(os.environ.get("OEE_OUTBOX_RETRY_MAX", "300"))
+# Interval thread flusher mengecek baris pending (detik)
+OUTBOX_FLUSH_INTERVAL = float(os.environ.get("OEE_OUTBOX_FLUSH_INTERVAL", "15"))
+# Berapa lama key baris terkirim disimpan untuk menolak submit ulang yang sama (hari)
+OUTBOX_RETENTION_DAYS = float(os.environ.get("OEE_OUTBOX_RETENTION_DAYS", "60"))
+
+# Urutan kirim: baris downtime suatu submit baru dikirim setelah baris OEE-nya terkirim
+SHEET_ORDER = ("oee", "downtime")
+
+PENDING = "pending"
+SENT = "sent"
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS outbox (
+    key TEXT PRIMARY KEY,
+    batch TEXT NOT NULL,
+    sheet TEXT NOT NULL,
+    row TEXT NOT NULL,
+    status TEXT NOT NULL DEFAULT 'pending',
+    attempts INTEGER NOT NULL DEFAULT 0,
+    next_attempt REAL NOT NULL DEFAULT 0,
+    suspect INTEGER NOT NULL DEFAULT 0,
+    last_error TEXT,
+    created_at REAL NOT NULL,
+    sent_at REAL
+);
+CREATE INDEX IF NOT EXISTS outbox_pending ON outbox (status, sheet, next_attempt);
+"""
+
+
+def _cell(value):
+    # samakan nilai yang dikirim dengan hasil baca ulang Sheets (angka di-numericise, kosong = "")
+    if value is None:
+        return ""
+    text = str(value).strip()
+    try:
+        number = float(text)
+    except ValueError:
+        return text
+    return repr(number) if number == number else text
+
+
+def row_key(sheet_name, row):
+    """Idempotency key baris: hash isi baris yang sudah dinormalisasi.
+
+    Submit ulang dengan isi yang sama menghasilkan key yang sama, sehingga tidak
+    pernah ditulis dua kali; key juga bisa dihitung dari baris hasil baca Sheets.
+    """
+    cells = [_cell(v) for v in row]
+    while cells and cells[-1] == "":
+        cells.pop()
+    return hashlib.sha1(json.dumps([sheet_name] + cells).encode("utf-8")).hexdigest()
+
+
+def _maybe_written(exc):
+    """False jika error pasti terjadi sebelum baris ditulis (throttle/4xx); selain itu anggap mungkin tertulis."""
+    try:
+        from gspread.exceptions import APIError
+    except ImportError:
+        return True
+    if isinstance(exc, APIError):
+        status = getattr(exc.response, "status_code", None)
+        return status is None or status >= 500
+    return True
+
+
+class Outbox:
+    """Write-ahead outbox untuk baris OEE/downtime.
+
+    enqueue() menjurnal semua baris satu submit dalam satu transaksi (INSERT OR
+    IGNORE per key), flush() mengirim baris pending dengan satu append_rows per
+    worksheet. Gagal -> baris tetap pending dengan backoff eksponensial. Jika
+    error bisa terjadi setelah Sheets menulis (timeout, 5xx), baris ditandai
+    suspect dan sebelum dikirim ulang worksheet dibaca sekali untuk menandai key
+    yang ternyata sudah ada, sehingga setiap baris tertulis tepat satu kali.
+    Hanya satu proses yang flush pada satu waktu (flock pada <path>.lock).
+    """
+
+    def __init__(self, path=OUTBOX_PATH):
+        self.path = path
+        self._ready = False
+        self._thread_lock = threading.Lock()
+
+    def _connect(self):
+        conn = sqlite3.connect(self.path, timeout=30)
+        if not self._ready:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.executescript(SCHEMA)
+            self._ready = True
+        return conn
+
+    # --- jurnal ---
+    def enqueue(self, rows):
+        """Jurnal list (sheet, row) satu submit; return list (key, baru?) dengan urutan sama."""
+        batch = uuid.uuid4().hex
+        now = time.time()
+        result = []
+        conn = self._connect()
+        try:
+            with conn:
+                for sheet, row in rows:
+                    key = row_key(sheet, row)
+                    cur = conn.execute(
+                        "INSERT OR IGNORE INTO outbox (key, batch, sheet, row, created_at) VALUES (?, ?, ?, ?, ?)",
+                        (key, batch, sheet, json.dumps(list(row), default=str), now))
+                    result.append((key, cur.rowcount == 1))
+        finally:
+            conn.close()
+        return result
+
+    def statuses(self, keys):
+        """Dict key -> (status, last_error) untuk key yang ada di outbox."""
+        keys = list(keys)
+        if not keys:
+            return {}
+        conn = self._connect()
+        try:
+            marks = ",".join("?" * len(keys))
+            cur = conn.execute(f"SELECT key, status, last_error FROM outbox WHERE key IN ({marks})", keys)
+            return {key: (status, error) for key, status, error in cur}
+        finally:
+            conn.close()
+
+    def pending_count(self):
+        conn = self._connect()
+        try:
+            return conn.execute("SELECT COUNT(*) FROM outbox WHERE status = ?", (PENDING,)).fetchone()[0]
+        finally:
+            conn.close()
+
+    def pending_summary(self):
+        """(jumlah baris pending, created_at pending tertua atau None)."""
+        conn = self._connect()
+        try:
+            return tuple(conn.execute("SELECT COUNT(*), MIN(created_at) FROM outbox WHERE status = ?", (PENDING,)).fetchone())
+        finally:
+            conn.close()
+
+    def prune(self, retention_days=OUTBOX_RETENTION_DAYS):
+        """Hapus key terkirim yang lebih tua dari retensi."""
+        conn = self._connect()
+        try:
+            with conn:
+                conn.execute("DELETE FROM outbox WHERE status = ? AND sent_at < ?",
+                             (SENT, time.time() - retention_days * 86400))
+        finally:
+            conn.close()
+
+    # --- kirim ---
+    def _flush_lock(self):
+        return _FileLock(self.path + ".lock", self._thread_lock)
+
+    def flush(self, source=None, on_sheet=None, now=None):
+        """Kirim baris pending yang sudah jatuh tempo; return dict sheet -> error terakhir (hanya yang gagal).
+
+        on_sheet(sheet, error) dipanggil setelah tiap worksheet selesai dicoba.
+        """
+        if source is None:
+            from datasource import get_data_source
+            source = get_data_source()
+        errors = {}
+        with self._flush_lock():
+            conn = self._connect()
+            try:
+                sheets = [r[0] for r in conn.execute("SELECT DISTINCT sheet FROM outbox WHERE status = ?", (PENDING,))]
+                sheets.sort(key=lambda s: (SHEET_ORDER.index(s) if s in SHEET_ORDER else len(SHEET_ORDER), s))
+                for i, sheet in enumerate(sheets):
+                    error = self._flush_sheet(conn, source, sheet, sheets[:i], time.time() if now is None else now)
+                    if error is not None:
+                        errors[sheet] = error
+                    if on_sheet is not None:
+                        on_sheet(sheet, error)
+            finally:
+                conn.close()
+        return errors
+
+    def _flush_sheet(self, conn, source, sheet, earlier, now):
+        # baris yang submit-nya masih punya baris pending di worksheet sebelumnya ditahan dulu
+        blocked = ""
+        params = [sheet, PENDING, now]
+        if earlier:
+            blocked = (" AND batch NOT IN (SELECT batch FROM outbox WHERE status = ? AND sheet IN (%s))"
+                       % ",".join("?" * len(earlier)))
+            params += [PENDING] + earlier
+        due = conn.execute("SELECT key, row, attempts, suspect FROM outbox WHERE sheet = ? AND status = ?"
+                           " AND next_attempt <= ?" + blocked + " ORDER BY rowid", params).fetchall()
+        if not due:
+            return None
+
+        try:
+            if any(suspect for _, _, _, suspect in due):
+                # percobaan sebelumnya mungkin sudah tertulis: cocokkan dengan isi worksheet
+                existing = {row_key(sheet, r) for r in source.read(sheet).values.tolist()}
+                landed = [key for key, _, _, _ in due if key in existing]
+                if landed:
+                    self._mark_sent(conn, landed, now)
+                    due = [d for d in due if d[0] not in existing]
+            if due:
+                source.append_rows(sheet, [json.loads(row) for _, row, _, _ in due])
+                self._mark_sent(conn, [key for key, _, _, _ in due], now)
+        except Exception as exc:
+            suspect = int(_maybe_written(exc))
+            with conn:
+                conn.executemany(
+                    "UPDATE outbox SET attempts = ?, next_attempt = ?, suspect = MAX(suspect, ?), last_error = ? WHERE key = ?",
+                    [(attempts + 1, now + _backoff(attempts + 1), suspect, str(exc)[:500], key)
+                     for key, _, attempts, _ in due])
+            logger.warning("Flush outbox %s gagal (%d baris, dicoba ulang nanti): %s", sheet, len(due), exc)
+            return exc
+        return None
+
+    @staticmethod
+    def _mark_sent(conn, keys, now):
+        with conn:
+            conn.executemany("UPDATE outbox SET status = ?, sent_at = ?, last_error = NULL WHERE key = ?",
+                             [(SENT, now, key) for key in keys])
+
+
+def _backoff(attempts):
+    delay = min(OUTBOX_RETRY_BASE * 2 ** (attempts - 1), OUTBOX_RETRY_MAX)
+    return delay * random.uniform(0.5, 1.0)
+
+
+class _FileLock:
+    """flock eksklusif antar proses (+ lock thread); tanpa fcntl hanya lock thread."""
+
+    def __init__(self, path, thread_lock):
+        self.path = path
+        self.thread_lock = thread_lock
+        self.fd = None
+
+    def __enter__(self):
+        self.thread_lock.acquire()
+        try:
+            import fcntl
+        except ImportError:
+            return self
+        try:
+            self.fd = os.open(self.path, os.O_RDWR | os.O_CREAT, 0o644)
+            fcntl.flock(self.fd, fcntl.LOCK_EX)
+        except BaseException:
+            self.__exit__(None, None, None)
+            raise
+        return self
+
+    def __exit__(self, *exc):
+        if self.fd is not None:
+            os.close(self.fd)  # menutup fd melepas flock
+            self.fd = None
+        self.thread_lock.release()
+
+
+_outbox = None
+_flusher = None
+_flusher_lock = threading.Lock()
+
+
+def get_outbox():
+    global _outbox
+    if _outbox is None:
+        _outbox = Outbox(OUTBOX_PATH)
+    return _outbox
+
+
+def _flush_loop(interval):
+    while True:
+        time.sleep(interval)
+        try:
+            outbox = get_outbox()
+            if outbox.pending_count():
+                outbox.flush()
+            outbox.prune()
+        except Exception:
+            logger.exception("Flusher outbox gagal; dicoba lagi di interval berikutnya")
+
+
+def start_flusher(interval=OUTBOX_FLUSH_INTERVAL):
+    """Jalankan thread daemon yang mengirim ulang baris pending (sekali per proses)."""
+    global _flusher
+    with _flusher_lock:
+        if _flusher is None or not _flusher.is_alive():
+            _flusher = threading.Thread(target=_flush_loop, args=(interval,), daemon=True, name="outbox-flusher")
+            _flusher.start()
+    return _flusher
@@ -0,0 +1,94 @@
+import os
+import json
+import threading
+import logging
+from collections import OrderedDict
+
+logger = logging.getLogger(__name__)
+
+# Jumlah hasil render yang disimpan di memori per worker
+RENDER_CACHE_SIZE = int(os.environ.get("OEE_RENDER_CACHE_SIZE", "64"))
+# Folder cache disk bersama antar worker gunicorn (opsional, butuh paket diskcache)
+RENDER_CACHE_DIR = os.environ.get("OEE_RENDER_CACHE_DIR", "")
+RENDER_CACHE_DISK_LIMIT = int(os.environ.get("OEE_RENDER_CACHE_DISK_LIMIT", str(256 * 1024 * 1024)))
+
+
+class RenderCache:
+    """Cache hasil render callback, key = (data_key snapshot, *argumen periode).
+
+    Tier memori: LRU berukuran tetap per worker. Tier disk (opsional): diskcache
+    di RENDER_CACHE_DIR, dibagi semua worker; nilai disimpan sebagai JSON Dash
+    sehingga worker lain bisa langsung mengirimkannya tanpa render ulang.
+    Saat data_key berganti (snapshot baru), entri versi lama dibuang otomatis.
+    """
+
+    def __init__(self, name, maxsize=RENDER_CACHE_SIZE, disk_dir=RENDER_CACHE_DIR):
+        self.name = name
+        self.maxsize = maxsize
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()
+        self._data_key = None
+        self.hits = 0
+        self.misses = 0
+        self.disk = _open_disk(os.path.join(disk_dir, name)) if disk_dir else None
+
+    def _roll_version(self, data_key):
+        # dipanggil dengan lock: snapshot berganti -> buang semua entri versi lama
+        if data_key == self._data_key:
+            return
+        old = self._data_key
+        self._entries.clear()
+        self._data_key = data_key
+        if self.disk is not None and old is not None:
+            self.disk.evict(old)
+
+    def get_or_compute(self, data_key, args, compute):
+        key = (data_key,) + tuple(args)
+        with self._lock:
+            self._roll_version(data_key)
+            if key in self._entries:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return self._entries[key]
+        value = None
+        disk_key = json.dumps(key, default=str) if self.disk is not None else None
+        if disk_key is not None:
+            cached = self.disk.get(disk_key)
+            if cached is not None:
+                value = json.loads(cached)
+        if value is None:
+            with self._lock:
+                self.misses += 1
+            value = compute()
+            if disk_key is not None:
+                try:
+                    from plotly.io.json import to_json_plotly
+                    self.disk.set(disk_key, to_json_plotly(value), tag=data_key)
+                except Exception:
+                    logger.exception("Gagal menulis render cache ke disk")
+        else:
+            with self._lock:
+                self.hits += 1
+        with self._lock:
+            if self._data_key == data_key:
+                self._entries[key] = value
+                self._entries.move_to_end(key)
+                while len(self._entries) > self.maxsize:
+                    self._entries.popitem(last=False)
+        return value
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            if self.disk is not None:
+                self.disk.clear()
+
+
+def _open_disk(path):
+    try:
+        import diskcache
+    except ImportError:
+        logger.warning("OEE_RENDER_CACHE_DIR di-set tapi paket diskcache tidak terpasang; hanya cache memori yang dipakai")
+        return None
+    return diskcache.Cache(path, size_limit=RENDER_CACHE_DISK_LIMIT,
+                           eviction_policy="least-recently-used", tag_index=True)
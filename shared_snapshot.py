@@ -0,0 +1,169 @@
+import os
+import json
+import time
+import shutil
+import logging
+
+logger = logging.getLogger(__name__)
+
+# Folder snapshot bersama antar worker gunicorn, sekaligus snapshot terakhir untuk warm start.
+# Set ke string kosong untuk menonaktifkan (tiap worker memuat datanya sendiri, startup selalu sinkron)
+SHARED_SNAPSHOT_DIR = os.environ.get("OEE_SHARED_SNAPSHOT_DIR",
+                                     os.path.join(os.path.dirname(os.path.abspath(__file__)), ".snapshot"))
+# Berapa lama worker follower menunggu generasi pertama dari loader sebelum memuat sendiri (detik)
+SHARED_SNAPSHOT_WAIT = float(os.environ.get("OEE_SHARED_SNAPSHOT_WAIT", "30"))
+# Interval worker follower mengecek generasi baru (detik); murah, hanya membaca file CURRENT
+SHARED_SNAPSHOT_POLL = float(os.environ.get("OEE_SHARED_SNAPSHOT_POLL", "5"))
+
+MANIFEST = "CURRENT"
+LOCK_FILE = "loader.lock"
+
+
+class SharedSnapshotStore:
+    """Snapshot dalam file Arrow IPC yang di-memory-map oleh semua worker.
+
+    Satu proses (pemegang loader.lock) menarik data dari sumber dan menulis tiap
+    frame ke `gen-<N>/<nama>.arrow`, lalu mengganti file CURRENT secara atomik.
+    Worker lain hanya membaca CURRENT dan me-map generasi terbaru tanpa copy untuk
+    kolom numerik/tanggal, sehingga RAM dan kuota API tidak bertambah per worker.
+    Jika loader mati, lock dilepas OS dan worker lain mengambil alih.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        os.makedirs(path, exist_ok=True)
+        self._lock_fd = None
+
+    # --- pemilihan loader ---
+    def try_acquire_loader(self):
+        """Return True jika proses ini (sudah/baru) menjadi loader."""
+        if self._lock_fd is not None:
+            return True
+        try:
+            import fcntl
+        except ImportError:
+            # tanpa flock (mis. Windows dev server) setiap proses memuat sendiri
+            return True
+        fd = os.open(os.path.join(self.path, LOCK_FILE), os.O_RDWR | os.O_CREAT, 0o644)
+        try:
+            fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except OSError:
+            os.close(fd)
+            return False
+        os.ftruncate(fd, 0)
+        os.write(fd, str(os.getpid()).encode())
+        self._lock_fd = fd
+        logger.info("pid %s menjadi loader snapshot bersama di %s", os.getpid(), self.path)
+        return True
+
+    @property
+    def is_loader(self):
+        return self._lock_fd is not None
+
+    # --- manifest ---
+    def current(self):
+        """Manifest generasi terbaru ({generation, data_key, written_at, fetched_at, frames}) atau None."""
+        try:
+            with open(os.path.join(self.path, MANIFEST), encoding="utf-8") as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    def current_generation(self):
+        manifest = self.current()
+        return manifest["generation"] if manifest else 0
+
+    # --- tulis (loader) ---
+    def publish(self, frames, data_key=None, fetched_at=None):
+        """Tulis frames sebagai generasi baru lalu tukar CURRENT; return nomor generasi."""
+        import pyarrow as pa
+
+        generation = self.current_generation() + 1
+        name = "gen-%06d" % generation
+        tmp_dir = os.path.join(self.path, "." + name + ".tmp")
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+        os.makedirs(tmp_dir)
+        for key, frame in frames.items():
+            table = _to_table(frame)
+            with pa.OSFile(os.path.join(tmp_dir, key + ".arrow"), "wb") as sink:
+                with pa.ipc.new_file(sink, table.schema) as writer:
+                    writer.write_table(table)
+        os.replace(tmp_dir, os.path.join(self.path, name))
+        manifest = {"generation": generation, "dir": name, "data_key": data_key,
+                    "written_at": time.time(), "fetched_at": fetched_at, "frames": sorted(frames)}
+        self._write_manifest(manifest)
+        self._prune(keep=generation - 1)
+        return generation
+
+    def touch(self, generation, fetched_at):
+        """Catat refresh sukses tanpa data baru: majukan fetched_at generasi yang sama di CURRENT."""
+        manifest = self.current()
+        if manifest is None or manifest["generation"] != generation:
+            return
+        manifest["fetched_at"] = fetched_at
+        self._write_manifest(manifest)
+
+    def _write_manifest(self, manifest):
+        # tulis ke file sementara lalu rename: pembaca tidak pernah melihat CURRENT setengah jadi
+        tmp_manifest = os.path.join(self.path, MANIFEST + ".tmp")
+        with open(tmp_manifest, "w", encoding="utf-8") as f:
+            json.dump(manifest, f)
+        os.replace(tmp_manifest, os.path.join(self.path, MANIFEST))
+
+    def _prune(self, keep):
+        # simpan generasi sekarang dan satu sebelumnya (mungkin masih dibaca worker lain);
+        # file yang masih di-map tetap valid setelah di-unlink
+        for entry in os.listdir(self.path):
+            if entry.startswith("gen-"):
+                try:
+                    gen = int(entry[4:])
+                except ValueError:
+                    continue
+                if gen < keep:
+                    shutil.rmtree(os.path.join(self.path, entry), ignore_errors=True)
+
+    # --- baca (semua worker) ---
+    def load(self, manifest=None):
+        """Map generasi di manifest; return (manifest, dict nama -> DataFrame) atau (None, None)."""
+        import pyarrow as pa
+
+        manifest = manifest or self.current()
+        if manifest is None:
+            return None, None
+        frames = {}
+        for key in manifest["frames"]:
+            source = pa.memory_map(os.path.join(self.path, manifest["dir"], key + ".arrow"), "r")
+            table = pa.ipc.open_file(source).read_all()
+            # split_blocks: kolom numerik tanpa null tetap view ke mmap (read-only), bukan salinan
+            frames[key] = table.to_pandas(split_blocks=True)
+        return manifest, frames
+
+
+def _to_table(frame):
+    import pyarrow as pa
+
+    try:
+        return pa.Table.from_pandas(frame, preserve_index=False)
+    except (pa.ArrowInvalid, pa.ArrowTypeError):
+        # kolom object campuran (mis. sku angka & teks dari sheet) -> simpan sebagai teks
+        frame = frame.copy()
+        for col in frame.columns:
+            if frame[col].dtype == object:
+                frame[col] = frame[col].where(frame[col].isna(), frame[col].astype(str))
+        return pa.Table.from_pandas(frame, preserve_index=False)
+
+
+_store = None
+
+
+def get_shared_store():
+    """Store proses ini, atau None jika OEE_SHARED_SNAPSHOT_DIR kosong / pyarrow tidak ada."""
+    global _store
+    if _store is None and SHARED_SNAPSHOT_DIR:
+        try:
+            import pyarrow  # noqa: F401
+        except ImportError:
+            logger.warning("OEE_SHARED_SNAPSHOT_DIR di-set tapi pyarrow tidak terpasang; snapshot dimuat per worker")
+            return None
+        _store = SharedSnapshotStore(SHARED_SNAPSHOT_DIR)
+    return _store
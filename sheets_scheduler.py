@@ -0,0 +1,231 @@
+import os
+import json
+import time
+import heapq
+import itertools
+import threading
+import logging
+from collections import deque
+from contextlib import contextmanager
+from concurrent.futures import Future
+
+from metrics import SHEETS_WAIT_SECONDS, SHEETS_THROTTLED, SHEETS_COALESCED
+
+logger = logging.getLogger(__name__)
+
+# Kuota request Google Sheets untuk SEMUA proses (worker gunicorn + job background), per menit
+SHEETS_RATE = float(os.environ.get("OEE_SHEETS_RATE", "60"))
+# Maksimal request beruntun tanpa menunggu (ukuran bucket)
+SHEETS_BURST = float(os.environ.get("OEE_SHEETS_BURST", "10"))
+# Token yang hanya boleh dipakai write: refresh dashboard tidak bisa menghabiskan kuota submit operator
+SHEETS_WRITE_RESERVE = float(os.environ.get("OEE_SHEETS_WRITE_RESERVE", "2"))
+# Jeda semua request setelah Sheets membalas 429 (detik)
+SHEETS_THROTTLE_PAUSE = float(os.environ.get("OEE_SHEETS_THROTTLE_PAUSE", "10"))
+# File state bucket bersama antar proses; string kosong -> bucket per proses
+SHEETS_BUCKET_FILE = os.environ.get("OEE_SHEETS_BUCKET_FILE",
+                                    os.path.join(os.path.dirname(os.path.abspath(__file__)), ".sheets_bucket"))
+
+# Prioritas antrian: angka kecil dilayani dulu
+PRIORITY = {"write": 0, "read": 1}
+
+
+class TokenBucket:
+    """Token bucket rate/menit; state di file ber-flock agar dibagi semua proses."""
+
+    def __init__(self, rate_per_min=SHEETS_RATE, burst=SHEETS_BURST, path=SHEETS_BUCKET_FILE):
+        self.rate = rate_per_min / 60.0
+        self.burst = burst
+        self.path = path
+        self._lock = threading.Lock()
+        self._memory = {"tokens": burst, "updated": time.time()}
+
+    @contextmanager
+    def _state(self):
+        with self._lock:
+            fcntl = None
+            if self.path:
+                try:
+                    import fcntl
+                except ImportError:
+                    pass
+            if fcntl is None:
+                yield self._memory
+                return
+            fd = os.open(self.path, os.O_RDWR | os.O_CREAT, 0o644)
+            try:
+                fcntl.flock(fd, fcntl.LOCK_EX)
+                try:
+                    state = json.loads(os.read(fd, 4096) or b"null") or dict(self._memory)
+                except ValueError:
+                    state = dict(self._memory)
+                yield state
+                os.lseek(fd, 0, os.SEEK_SET)
+                os.ftruncate(fd, 0)
+                os.write(fd, json.dumps(state).encode())
+            finally:
+                os.close(fd)  # menutup fd melepas flock
+
+    def take(self, reserve=0):
+        """Ambil satu token jika sisanya tetap >= reserve; return 0, atau detik tunggu sampai cukup."""
+        reserve = min(reserve, max(self.burst - 1, 0))
+        with self._state() as state:
+            now = time.time()
+            tokens = min(self.burst, state["tokens"] + max(now - state["updated"], 0) * self.rate)
+            state["updated"] = now
+            if tokens >= 1 + reserve:
+                state["tokens"] = tokens - 1
+                return 0.0
+            state["tokens"] = tokens
+            return (1 + reserve - tokens) / self.rate
+
+    def drain(self, pause):
+        """Kosongkan bucket (setelah 429) sehingga semua proses menunggu sekitar pause detik."""
+        with self._state() as state:
+            state["tokens"] = -pause * self.rate
+            state["updated"] = time.time()
+
+
+class _KindStats:
+    def __init__(self):
+        self.calls = 0
+        self.coalesced = 0
+        self.throttled = 0
+        self.errors = 0
+        self.wait_sum = 0.0
+        self.wait_max = 0.0
+        self.waits = deque(maxlen=1024)
+
+    def snapshot(self):
+        waits = sorted(self.waits)
+
+        def pct(q):
+            return waits[min(int(q * len(waits)), len(waits) - 1)] if waits else 0.0
+
+        return {"calls": self.calls, "coalesced": self.coalesced, "throttled": self.throttled,
+                "errors": self.errors, "wait_seconds_sum": self.wait_sum, "wait_seconds_max": self.wait_max,
+                "wait_seconds_p50": pct(0.5), "wait_seconds_p95": pct(0.95)}
+
+
+class SheetsScheduler:
+    """Gerbang tunggal semua request Sheets di proses ini.
+
+    - Rate: setiap request mengambil satu token dari TokenBucket bersama.
+    - Prioritas: antrian heap (write sebelum read, lalu FIFO); read juga tidak
+      boleh memakai token cadangan write, sehingga submit operator tetap lewat
+      saat refresh dashboard sedang ramai (juga antar proses).
+    - Coalescing: read dengan key sama yang sedang berjalan/antre tidak dikirim
+      lagi; pemanggil berikutnya menunggu dan memakai hasil yang sama.
+    - 429: bucket dikosongkan selama SHEETS_THROTTLE_PAUSE lalu error diteruskan
+      (outbox / refresher yang mengulang).
+    """
+
+    def __init__(self, bucket=None, write_reserve=SHEETS_WRITE_RESERVE):
+        self.bucket = bucket or TokenBucket()
+        self.write_reserve = write_reserve
+        self._cond = threading.Condition()
+        self._queue = []
+        self._seq = itertools.count()
+        self._inflight = {}
+        self.stats = {kind: _KindStats() for kind in PRIORITY}
+
+    def call(self, fn, kind="read", key=None):
+        """Jalankan fn() saat kuota mengizinkan; key (hanya read) untuk menggabungkan read identik."""
+        if key is None or kind != "read":
+            return self._run(fn, kind)
+        with self._cond:
+            future = self._inflight.get(key)
+            owner = future is None
+            if owner:
+                future = self._inflight[key] = Future()
+            else:
+                self.stats[kind].coalesced += 1
+        if not owner:
+            SHEETS_COALESCED.inc(kind=kind)
+            return future.result()
+        try:
+            result = self._run(fn, kind)
+        except BaseException as exc:
+            with self._cond:
+                self._inflight.pop(key, None)
+            future.set_exception(exc)
+            raise
+        with self._cond:
+            self._inflight.pop(key, None)
+        future.set_result(result)
+        return result
+
+    def _run(self, fn, kind):
+        ticket = (PRIORITY[kind], next(self._seq))
+        reserve = self.write_reserve if kind == "read" else 0
+        started = time.monotonic()
+        with self._cond:
+            heapq.heappush(self._queue, ticket)
+            self._cond.notify_all()
+            try:
+                while True:
+                    if self._queue[0] == ticket:
+                        wait = self.bucket.take(reserve)
+                        if wait <= 0:
+                            break
+                        # cek ulang berkala: proses lain bisa mengubah bucket, write baru bisa menyalip
+                        self._cond.wait(min(wait, 1.0))
+                    else:
+                        self._cond.wait()
+            finally:
+                self._queue.remove(ticket)
+                heapq.heapify(self._queue)
+                self._cond.notify_all()
+            waited = time.monotonic() - started
+            stats = self.stats[kind]
+            stats.calls += 1
+            stats.wait_sum += waited
+            stats.wait_max = max(stats.wait_max, waited)
+            stats.waits.append(waited)
+        SHEETS_WAIT_SECONDS.observe(waited, kind=kind)
+        try:
+            return fn()
+        except Exception as exc:
+            with self._cond:
+                stats.errors += 1
+                throttled = _is_throttled(exc)
+                if throttled:
+                    stats.throttled += 1
+            if throttled:
+                SHEETS_THROTTLED.inc(kind=kind)
+                logger.warning("Sheets membalas 429; semua request ditahan %.0f detik", SHEETS_THROTTLE_PAUSE)
+                self.bucket.drain(SHEETS_THROTTLE_PAUSE)
+            raise
+
+    def queue_depth(self):
+        with self._cond:
+            depth = {kind: 0 for kind in PRIORITY}
+            for priority, _ in self._queue:
+                depth[next(k for k, p in PRIORITY.items() if p == priority)] += 1
+            return depth
+
+    def metrics(self):
+        """Kedalaman antrian dan statistik waktu tunggu per jenis request (proses ini)."""
+        with self._cond:
+            stats = {kind: s.snapshot() for kind, s in self.stats.items()}
+            inflight = len(self._inflight)
+        return {"queue_depth": self.queue_depth(), "inflight_reads": inflight, **stats}
+
+
+def _is_throttled(exc):
+    try:
+        from gspread.exceptions import APIError
+    except ImportError:
+        return False
+    return isinstance(exc, APIError) and getattr(exc.response, "status_code", None) == 429
+
+
+_scheduler = None
+_scheduler_lock = threading.Lock()
+
+
+def get_scheduler():
+    global _scheduler
+    with _scheduler_lock:
+        if _scheduler is None:
+            _scheduler = SheetsScheduler()
+        return _scheduler
@@ -0,0 +1,346 @@
+import os
+import hashlib
+import threading
+import time
+import logging
+import pandas as pd
+from utils import load_sheet, load_sheet_since, calculate_oee, compact_frame, memory_footprint
+from cube import build_cube, build_pareto
+from drilldown import DrilldownIndex
+from shared_snapshot import get_shared_store, SHARED_SNAPSHOT_WAIT, SHARED_SNAPSHOT_POLL
+from metrics import SNAPSHOT_REFRESH_SECONDS, SNAPSHOT_REFRESH_ERRORS
+from datasource import SHEET_HEADERS
+
+logger = logging.getLogger(__name__)
+
+# Interval refresh data dari sumber (detik)
+REFRESH_TTL = int(os.environ.get("OEE_REFRESH_TTL", "300"))
+# Setiap N refresh lakukan reload penuh (jaga-jaga jika ada baris lama yang diedit/dihapus manual)
+FULL_RELOAD_EVERY = int(os.environ.get("OEE_FULL_RELOAD_EVERY", "12"))
+# Snapshot dianggap basi jika datanya lebih tua dari ini (detik); default 3x interval refresh
+STALE_AFTER = int(os.environ.get("OEE_STALE_AFTER", str(3 * REFRESH_TTL)))
+
+SHEETS = ("oee", "downtime")
+OUTPUTS = ("df", "df_harian", "df_bulanan", "downtime_summary", "df_downtime", "cube")
+
+
+class Snapshot:
+    """Satu versi data dashboard yang sudah lengkap dihitung (read-only bagi callback).
+
+    Callback cukup memanggil get_snapshot() sekali lalu memakai atribut-atributnya;
+    data snapshot tidak pernah diubah setelah dipublikasikan, refresh membuat objek baru;
+    hanya `fetched_at` yang dimajukan oleh refresh sukses yang tidak menemukan data baru.
+    `prepared=True` untuk frame yang sudah berskema ringkas (mis. hasil map dari
+    snapshot bersama), sehingga tidak disalin/diubah lagi. `from_cache=True` menandai
+    snapshot warm-start dari disk yang belum dikonfirmasi reload live.
+    """
+
+    def __init__(self, df, df_harian, df_bulanan, downtime_summary, df_downtime, cube, version,
+                 prepared=False, fetched_at=None, from_cache=False):
+        if not prepared:
+            if not df_harian.empty and "tanggal" in df_harian.columns:
+                # kolom bulan dihitung di sini, bukan di callback (snapshot tidak boleh dimutasi)
+                df_harian["bulan"] = df_harian["tanggal"].dt.to_period("M")
+            # skema ringkas: category untuk teks berulang, float32 measure, kode bulan/tahun integer
+            df = compact_frame(df)
+            df_downtime = compact_frame(df_downtime)
+            # cube (line, tanggal, shift, sku) + pareto berkode bulan: sumber semua tampilan dashboard
+            for col in ("line", "shift", "sku"):
+                if col in cube.columns:
+                    cube[col] = cube[col].astype("category")
+        self.df = df
+        self.df_harian = df_harian
+        self.df_bulanan = df_bulanan
+        self.downtime_summary = downtime_summary
+        self.df_downtime = df_downtime
+        self.cube = cube
+        self.pareto = build_pareto(downtime_summary)
+        self.version = version
+        self.loaded_at = time.time()
+        # kapan data ini terakhir ditarik dari sumber (untuk snapshot dari disk: waktu aslinya, bukan waktu load)
+        self.fetched_at = fetched_at or self.loaded_at
+        self.from_cache = from_cache
+        self._drilldown = None
+        # sidik jari isi data (sama di semua worker untuk data yang sama); dipakai sebagai key cache render
+        self.data_key = _fingerprint(cube, self.pareto)
+        self.memory = memory_footprint({
+            "df": self.df, "df_harian": df_harian, "df_bulanan": df_bulanan,
+            "downtime_summary": downtime_summary, "df_downtime": self.df_downtime,
+            "cube": cube, "pareto": self.pareto,
+        })
+        logger.info("Snapshot v%s (pid %s): %d baris OEE, %d baris downtime, memori %.1f MB %s",
+                    version, os.getpid(), len(self.df), len(self.df_downtime),
+                    self.memory["total"] / 1e6, {k: round(v / 1e6, 2) for k, v in self.memory.items() if k != "total"})
+
+    @property
+    def drilldown(self):
+        # dibangun saat klik grafik pertama, lalu dipakai ulang selama snapshot hidup
+        if self._drilldown is None:
+            self._drilldown = DrilldownIndex(self.df, self.df_downtime)
+        return self._drilldown
+
+    @property
+    def age(self):
+        return time.time() - self.fetched_at
+
+    @property
+    def is_stale(self):
+        return self.from_cache or self.age > STALE_AFTER
+
+    def frames(self):
+        """Frame-frame penyusun snapshot (nama sesuai OUTPUTS), untuk ditulis ke store bersama."""
+        return {name: getattr(self, name) for name in OUTPUTS}
+
+
+def _fingerprint(*frames):
+    digest = hashlib.sha1()
+    for frame in frames:
+        digest.update(pd.util.hash_pandas_object(frame, index=False).to_numpy().tobytes())
+    return digest.hexdigest()[:16]
+
+
+def _month_key(frame, column="tanggal"):
+    if column not in frame.columns:
+        return pd.Series([pd.NaT] * len(frame), index=frame.index, dtype="period[M]")
+    values = frame[column]
+    if isinstance(values.dtype, pd.PeriodDtype):
+        return values
+    return pd.to_datetime(values, errors="coerce").dt.to_period("M")
+
+
+def _split_by_month(frame, key):
+    # baris tanpa tanggal valid dikumpulkan di partisi None
+    if frame.empty:
+        return {}
+    return {(None if pd.isna(k) else k): part for k, part in frame.groupby(key, sort=False, dropna=False)}
+
+
+def _sorted_months(months):
+    return sorted(months, key=lambda m: (m is None, m if m is not None else pd.Period("1970-01", "M")))
+
+
+class IncrementalBuilder:
+    """Ingest sheet append-only secara bertahap dan hitung ulang hanya bulan yang berubah.
+
+    Menyimpan offset baris terakhir per worksheet, data mentah per bulan, dan hasil
+    calculate_oee per bulan. Semua agregat (harian, bulanan, pareto, availability per
+    baris) tidak melintasi batas bulan, jadi cukup bulan yang kebagian baris baru yang
+    dihitung ulang; biaya refresh mengikuti jumlah data baru, bukan panjang histori.
+    """
+
+    def __init__(self, source=None):
+        self.source = source
+        self.refreshes = 0
+        self._reset()
+
+    def _reset(self):
+        self.offsets = {name: 0 for name in SHEETS}
+        self.columns = {name: None for name in SHEETS}
+        self.raw = {name: {} for name in SHEETS}
+        self.results = {}
+
+    def _fetch(self, full):
+        if full:
+            self._reset()
+            return {name: load_sheet(name, self.source) for name in SHEETS}
+        return {name: load_sheet_since(name, self.offsets[name], self.source) for name in SHEETS}
+
+    def update(self):
+        """Tarik baris baru; return True jika ada data yang berubah."""
+        full = self.refreshes % FULL_RELOAD_EVERY == 0
+        self.refreshes += 1
+        new = self._fetch(full)
+        affected = set()
+        for name, frame in new.items():
+            if len(frame.columns) == 0:
+                continue
+            frame.columns = frame.columns.str.strip().str.lower()
+            if self.columns[name] is None:
+                self.columns[name] = list(frame.columns)
+            elif list(frame.columns) != self.columns[name]:
+                # header berubah: tidak aman digabung, ulangi sebagai reload penuh
+                self.refreshes = 0
+                return self.update()
+            self.offsets[name] += len(frame)
+            for month, part in _split_by_month(frame, _month_key(frame)).items():
+                old = self.raw[name].get(month)
+                self.raw[name][month] = part if old is None else pd.concat([old, part])
+                affected.add(month)
+        if affected:
+            self._recompute(affected)
+        return full or bool(affected)
+
+    def _raw_subset(self, name, months):
+        parts = [self.raw[name][m] for m in _sorted_months(months) if m in self.raw[name]]
+        if parts:
+            # index harus 0..n-1: calculate_oee menyelaraskan hasil merge berdasarkan posisi
+            return pd.concat(parts, ignore_index=True)
+        # sheet tanpa header sama sekali: pakai header asli supaya calculate_oee tetap jalan
+        return pd.DataFrame(columns=self.columns[name] or SHEET_HEADERS.get(name, []))
+
+    def _recompute(self, months):
+        sub_oee = self._raw_subset("oee", months)
+        sub_downtime = self._raw_subset("downtime", months)
+        # calculate_oee memproses sub_downtime in-place (tanggal, start/finish, duration)
+        df, df_harian, df_bulanan, downtime_summary = calculate_oee(sub_oee, sub_downtime)
+        cube = build_cube(df, sub_downtime)
+        outputs = {
+            "df": _split_by_month(df, _month_key(df)),
+            "df_harian": _split_by_month(df_harian, _month_key(df_harian)),
+            "df_bulanan": _split_by_month(df_bulanan, _month_key(df_bulanan, "bulan")),
+            "downtime_summary": _split_by_month(downtime_summary, _month_key(downtime_summary, "bulan")),
+            "df_downtime": _split_by_month(sub_downtime, _month_key(sub_downtime)),
+            "cube": _split_by_month(cube, _month_key(cube)),
+        }
+        for month in months:
+            self.results[month] = {out: parts.get(month) for out, parts in outputs.items()}
+
+    def _empty_outputs(self):
+        # hasil calculate_oee/build_cube dari frame header saja: kosong tapi kolomnya lengkap
+        sub_oee, sub_downtime = self._raw_subset("oee", ()), self._raw_subset("downtime", ())
+        df, df_harian, df_bulanan, downtime_summary = calculate_oee(sub_oee, sub_downtime)
+        return {"df": df, "df_harian": df_harian, "df_bulanan": df_bulanan,
+                "downtime_summary": downtime_summary, "df_downtime": sub_downtime,
+                "cube": build_cube(df, sub_downtime)}
+
+    def frames(self):
+        """Gabungkan hasil per bulan (urut bulan) menjadi frame utuh untuk snapshot."""
+        months = _sorted_months(self.results)
+        combined = {}
+        empty = None
+        for out in OUTPUTS:
+            parts = [self.results[m][out] for m in months if self.results[m][out] is not None]
+            if parts:
+                combined[out] = pd.concat(parts).reset_index(drop=True)
+                continue
+            if empty is None:
+                empty = self._empty_outputs()
+            combined[out] = empty[out]
+        return combined
+
+
+_current = None
+_build_lock = threading.Lock()
+_builder = None
+_refresher = None
+
+
+def _get_builder(source=None):
+    global _builder
+    if _builder is None or (source is not None and _builder.source is not source):
+        _builder = IncrementalBuilder(source)
+    return _builder
+
+
+def _refresh_locked(source=None):
+    global _current
+    store = get_shared_store()
+    if store is not None and not store.try_acquire_loader():
+        # worker follower: cukup map generasi terbaru yang ditulis loader
+        if _follow_locked(store, wait=SHARED_SNAPSHOT_WAIT if _current is None else 0) or _current is not None:
+            return
+        logger.warning("Belum ada snapshot bersama dari loader, worker pid %s memuat data sendiri", os.getpid())
+    builder = _get_builder(source)
+    changed = builder.update()
+    if changed or _current is None:
+        version = (_current.version + 1) if _current is not None else 1
+        snap = Snapshot(version=version, **builder.frames())
+        if store is not None and store.is_loader:
+            # nomor generasi store menjadi versi snapshot (sama di semua worker)
+            snap.version = store.publish(snap.frames(), snap.data_key, snap.fetched_at)
+        _current = snap
+        return
+    # refresh sukses tanpa baris baru: data tetap segar, majukan waktu tarik (juga di manifest untuk follower)
+    _current.fetched_at = time.time()
+    if store is not None and store.is_loader:
+        store.touch(_current.version, _current.fetched_at)
+
+
+def _follow_locked(store, wait=0):
+    """Ganti _current dengan generasi terbaru di store; return False jika belum ada generasi."""
+    global _current
+    deadline = time.time() + wait
+    manifest = store.current()
+    while manifest is None and time.time() < deadline:
+        time.sleep(0.5)
+        manifest = store.current()
+    if manifest is None:
+        return False
+    if _current is None or _current.version != manifest["generation"]:
+        _current = _load_generation(store, manifest)
+    else:
+        # generasi sama: loader mungkin sudah refresh tanpa data baru (heartbeat di manifest)
+        _current.fetched_at = max(_current.fetched_at, manifest.get("fetched_at") or manifest["written_at"])
+    return True
+
+
+def _load_generation(store, manifest, from_cache=False):
+    manifest, frames = store.load(manifest)
+    return Snapshot(version=manifest["generation"], prepared=True, from_cache=from_cache,
+                    fetched_at=manifest.get("fetched_at") or manifest["written_at"], **frames)
+
+
+def _warm_start_locked():
+    """Pakai snapshot terakhir di disk (jika ada) agar startup tidak menunggu sumber data."""
+    global _current
+    store = get_shared_store()
+    manifest = store.current() if store is not None else None
+    if manifest is None:
+        return False
+    try:
+        _current = _load_generation(store, manifest, from_cache=True)
+    except Exception:
+        logger.exception("Snapshot di disk tidak bisa dibaca, memuat dari sumber")
+        return False
+    logger.info("Warm start dari snapshot generasi %s (umur %.0f detik); reload live berjalan di background",
+                _current.version, _current.age)
+    return True
+
+
+def refresh(source=None):
+    """Ingest baris baru, lalu tukar referensi global secara atomik jika data berubah."""
+    with _build_lock:
+        started = time.perf_counter()
+        _refresh_locked(source)
+        SNAPSHOT_REFRESH_SECONDS.observe(time.perf_counter() - started)
+    return _current
+
+
+def get_snapshot():
+    # pemanggilan pertama (startup): pakai snapshot di disk jika ada, kalau tidak bangun secara sinkron
+    if _current is None:
+        with _build_lock:
+            if _current is None and not _warm_start_locked():
+                started = time.perf_counter()
+                _refresh_locked()
+                SNAPSHOT_REFRESH_SECONDS.observe(time.perf_counter() - started)
+    return _current
+
+
+def _refresh_loop(ttl):
+    store = get_shared_store()
+    # snapshot warm-start langsung diganti data live, tanpa menunggu ttl pertama
+    first = _current is not None and _current.from_cache
+    while True:
+        # follower cukup mengecek file CURRENT, jadi boleh lebih sering dari ttl
+        follower = store is not None and not store.is_loader
+        if not first:
+            time.sleep(min(ttl, SHARED_SNAPSHOT_POLL) if follower else ttl)
+        first = False
+        try:
+            refresh()
+        except Exception:
+            SNAPSHOT_REFRESH_ERRORS.inc()
+            # tetap layani snapshot lama jika sumber data error
+            logger.exception("Refresh snapshot gagal, snapshot lama tetap dipakai")
+
+
+def start_refresher(ttl=None):
+    """Jalankan thread daemon yang me-refresh snapshot tiap ttl detik (sekali per proses)."""
+    global _refresher
+    if _refresher is not None:
+        return _refresher
+    ttl = ttl or REFRESH_TTL
+    _refresher = threading.Thread(target=_refresh_loop, args=(ttl,), name="oee-snapshot-refresh", daemon=True)
+    _refresher.start()
+    return _refresher
@@ -1,21 +1,98 @@
+import numpy as np
 import pandas as pd
-import gspread
-from oauth2client.service_account import ServiceAccountCredentials
+from datasource import GoogleSheetSource, get_data_source
 
 # --- Fungsi ambil data dari Google Sheets ---
 def load_google_sheet(sheet_url, sheet_name):
-    scope = ["https://spreadsheets.google.com/feeds",
-             "https://www.googleapis.com/auth/drive"]
-    creds = ServiceAccountCredentials.from_json_keyfile_name("credentials.json", scope)
-    client = gspread.authorize(creds)
-    sheet = client.open_by_url(sheet_url).worksheet(sheet_name)
-    data = sheet.get_all_records()
-    df = pd.DataFrame(data)
+    df = GoogleSheetSource(sheet_url).read(sheet_name)
+    return _normalize_loaded(df)
+
+# --- Fungsi ambil data dari backend aktif (Sheets / lokal / fake, lihat datasource.py) ---
+def load_sheet(sheet_name, source=None):
+    df = (source or get_data_source()).read(sheet_name)
+    return _normalize_loaded(df)
+
+# --- Ambil hanya baris baru (sheet append-only), mulai dari baris data ke-offset ---
+def load_sheet_since(sheet_name, offset, source=None):
+    df = (source or get_data_source()).read_since(sheet_name, offset)
+    return _normalize_loaded(df)
+
+def _normalize_loaded(df):
     # Jika ada kolom 'line', pastikan bertipe string
     if 'line' in df.columns:
         df['line'] = df['line'].astype(str)
     return df
 
+# --- Skema ringkas untuk frame yang disimpan di snapshot ---
+CATEGORICAL_COLS = ["line", "shift", "sku", "kategori", "workcenter", "proses", "equipment", "user"]
+MEASURE_COLS = ["good product output", "hold & all defect", "loading time", "output maksimal",
+                "downtime", "duration", "availability", "performance", "quality", "oee"]
+
+def compact_frame(df, measures_dtype="float32"):
+    """Ubah frame OEE/downtime ke skema ringkas (in-place) dan kembalikan frame tsb.
+
+    Kolom teks berulang -> category, tanggal -> datetime64, measure -> float32, plus
+    kode integer `kode_bulan` (YYYYMM) dan `tahun` untuk filter periode tanpa string.
+    """
+    for col in CATEGORICAL_COLS:
+        if col in df.columns and not isinstance(df[col].dtype, pd.CategoricalDtype):
+            values = df[col]
+            if col in ("line", "shift"):
+                values = values.astype(str)
+            df[col] = values.astype("category")
+    for col in MEASURE_COLS:
+        if col in df.columns:
+            df[col] = pd.to_numeric(df[col], errors="coerce").astype(measures_dtype)
+    if "tanggal" in df.columns:
+        df["tanggal"] = pd.to_datetime(df["tanggal"], errors="coerce")
+        df["kode_bulan"] = (df["tanggal"].dt.year * 100 + df["tanggal"].dt.month).fillna(0).astype("int32")
+        df["tahun"] = (df["kode_bulan"] // 100).astype("int16")
+    return df
+
+def memory_footprint(frames):
+    """Byte per frame (deep) + total, untuk laporan memori per worker."""
+    usage = {name: int(frame.memory_usage(deep=True).sum()) for name, frame in frames.items()}
+    usage["total"] = sum(usage.values())
+    return usage
+
+# --- Kernel metrik OEE (satu-satunya rumus; dipakai calculate_oee dan dashboard) ---
+def oee_metrics(good, defect, loading, max_output, downtime):
+    """Hitung availability, performance, quality, OEE (persen) dari komponen yang sudah dijumlahkan.
+
+    Input boleh skalar, array atau Series untuk grouping apa pun (baris, harian, bulanan, per line).
+    Pembagian dengan nol diberi mask eksplisit dan menghasilkan NaN:
+      availability = (loading - downtime) / loading        (NaN jika loading <= 0)
+      performance  = (good + defect) / output maksimal      (NaN jika output maksimal == 0)
+      quality      = (good - defect) / good                 (NaN jika good == 0)
+      oee          = availability * performance * quality / 10000
+    """
+    good = np.asarray(good, dtype="float64")
+    defect = np.asarray(defect, dtype="float64")
+    loading = np.asarray(loading, dtype="float64")
+    max_output = np.asarray(max_output, dtype="float64")
+    downtime = np.asarray(downtime, dtype="float64")
+
+    ok_avail = loading > 0
+    ok_perf = max_output != 0
+    ok_qual = good != 0
+    with np.errstate(divide="ignore", invalid="ignore"):
+        availability = np.where(ok_avail, (loading - downtime) / np.where(ok_avail, loading, 1.0), np.nan) * 100
+        performance = np.where(ok_perf, (good + defect) / np.where(ok_perf, max_output, 1.0), np.nan) * 100
+        quality = np.where(ok_qual, (good - defect) / np.where(ok_qual, good, 1.0), np.nan) * 100
+    oee = availability * performance * quality / 10000
+    return availability, performance, quality, oee
+
+def add_oee_metrics(frame, downtime):
+    """Tambahkan kolom availability/performance/quality/oee ke frame berkolom komponen standar."""
+    availability, performance, quality, oee = oee_metrics(
+        frame["good product output"], frame["hold & all defect"],
+        frame["loading time"], frame["output maksimal"], downtime)
+    frame["availability"] = availability
+    frame["performance"] = performance
+    frame["quality"] = quality
+    frame["oee"] = oee
+    return frame
+
 # --- Hitung OEE & KPI ---
 def calculate_oee(df_oee, df_downtime):
     # Standardisasi nama kolom
@@ -64,34 +141,12 @@ def calculate_oee(df_oee, df_downtime):
             df_downtime.groupby(["line", "tanggal"])['duration'].sum().reset_index(),
             on=["line", "tanggal"],
             how="left"
-        )['duration'].fillna(0)
-        with pd.option_context('mode.use_inf_as_na', True):
-            # Proteksi jika loading time <= 0
-            avail = (df["loading time"] - downtime_per_row)
-            avail = avail.where(df["loading time"] > 0, pd.NA)
-            df["availability"] = (avail / df["loading time"]).replace([float('inf'), -float('inf')], pd.NA) * 100
+        )['duration'].fillna(0).to_numpy()
     else:
         # fallback: tetap pakai total downtime (kurang akurat)
-        with pd.option_context('mode.use_inf_as_na', True):
-            df["availability"] = (((df["loading time"] - df_downtime["duration"].sum())) / df["loading time"]).replace([float('inf'), -float('inf')], pd.NA) * 100
-
-    # Proteksi pembagian dengan nol untuk performance dan quality
-    with pd.option_context('mode.use_inf_as_na', True):
-        # Rumus performance baru: (good product output + hold & all defect) / output maksimal
-        denom_perf = df["output maksimal"].replace(0, pd.NA)
-        numer_perf = df["good product output"] + df["hold & all defect"]
-        perf = (numer_perf / denom_perf).replace([float('inf'), -float('inf')], pd.NA)
-        df["performance"] = perf * 100
-
-        # Quality tetap sesuai rumus sebelumnya
-        numer_qual = df["good product output"] - df["hold & all defect"]
-        denom_qual = df["good product output"]
-        denom_qual = denom_qual.replace(0, pd.NA)
-        qual = (numer_qual / denom_qual).replace([float('inf'), -float('inf')], pd.NA)
-        df["quality"] = qual * 100
-
-        df["oee"] = (df["availability"] * df["performance"] * df["quality"]) / 10000
+        downtime_per_row = np.full(len(df), df_downtime["duration"].sum() if "duration" in df_downtime else 0.0)
 
+    add_oee_metrics(df, downtime_per_row)
 
     # Tambah kolom bulan
     if "tanggal" in df:
@@ -111,52 +166,20 @@ def calculate_oee(df_oee, df_downtime):
         df_harian = df_harian.merge(downtime_harian, on=["tanggal", "line"], how="left")
         df_harian['duration'] = df_harian['duration'].fillna(0)
         # Hitung OEE harian dari total harian per line
-        with pd.option_context('mode.use_inf_as_na', True):
-            denom_perf = df_harian["output maksimal"].replace(0, pd.NA)
-            numer_perf = df_harian["good product output"] + df_harian["hold & all defect"]
-            perf = (numer_perf / denom_perf).replace([float('inf'), -float('inf')], pd.NA)
-            df_harian["performance"] = perf * 100
-
-            numer_qual = df_harian["good product output"] - df_harian["hold & all defect"]
-            denom_qual = df_harian["good product output"]
-            denom_qual = denom_qual.replace(0, pd.NA)
-            qual = (numer_qual / denom_qual).replace([float('inf'), -float('inf')], pd.NA)
-            df_harian["quality"] = qual * 100
-
-            # Availability harian: total loading time - total downtime harian PER LINE
-            avail = (df_harian["loading time"] - df_harian["duration"])
-            avail = avail.where(df_harian["loading time"] > 0, pd.NA)
-            df_harian["availability"] = (avail / df_harian["loading time"]).replace([float('inf'), -float('inf')], pd.NA) * 100
-
-            df_harian["oee"] = (df_harian["availability"] * df_harian["performance"] * df_harian["quality"]) / 10000
+        add_oee_metrics(df_harian, df_harian["duration"])
 
         # OEE bulanan berbasis total agregat
         df["bulan"] = df["tanggal"].dt.to_period("M")
         df_bulanan = df.groupby("bulan")[agg_cols].sum().reset_index()
-        with pd.option_context('mode.use_inf_as_na', True):
-            denom_perf = df_bulanan["output maksimal"].replace(0, pd.NA)
-            numer_perf = df_bulanan["good product output"] + df_bulanan["hold & all defect"]
-            perf = (numer_perf / denom_perf).replace([float('inf'), -float('inf')], pd.NA)
-            df_bulanan["performance"] = perf * 100
-
-            numer_qual = df_bulanan["good product output"] - df_bulanan["hold & all defect"]
-            denom_qual = df_bulanan["good product output"]
-            denom_qual = denom_qual.replace(0, pd.NA)
-            qual = (numer_qual / denom_qual).replace([float('inf'), -float('inf')], pd.NA)
-            df_bulanan["quality"] = qual * 100
-
-            # Availability bulanan: total loading time - total downtime bulanan
-            if "bulan" in df_downtime:
-                df_downtime["bulan"] = pd.to_datetime(df_downtime["tanggal"], errors="coerce").dt.to_period("M")
-                downtime_bulanan = df_downtime.groupby("bulan")["duration"].sum().reset_index()
-                df_bulanan = df_bulanan.merge(downtime_bulanan, on="bulan", how="left")
-                df_bulanan["duration"] = df_bulanan["duration"].fillna(0)
-                avail = ((df_bulanan["loading time"] - df_bulanan["duration"]) / df_bulanan["loading time"]).replace([float('inf'), -float('inf')], pd.NA) * 100
-                df_bulanan["availability"] = avail
-            else:
-                df_bulanan["availability"] = pd.NA
-
-            df_bulanan["oee"] = (df_bulanan["availability"] * df_bulanan["performance"] * df_bulanan["quality"]) / 10000
+        # Availability bulanan: total loading time - total downtime bulanan
+        if "tanggal" in df_downtime and "duration" in df_downtime:
+            df_downtime["bulan"] = pd.to_datetime(df_downtime["tanggal"], errors="coerce").dt.to_period("M")
+            downtime_bulanan = df_downtime.groupby("bulan")["duration"].sum().reset_index()
+            df_bulanan = df_bulanan.merge(downtime_bulanan, on="bulan", how="left")
+            df_bulanan["duration"] = df_bulanan["duration"].fillna(0)
+        else:
+            df_bulanan["duration"] = np.nan
+        add_oee_metrics(df_bulanan, df_bulanan["duration"])
 
     else:
         df_harian = pd.DataFrame()